@@ -1,11 +1,13 @@
 """Streamlit Web UI for Research Assistant Agent."""
 import streamlit as st
-import asyncio
+import time
 from datetime import datetime
 from pathlib import Path
 import json
 from src.state import ResearchState
-from src.workflow import research_agent
+from src.workflow import stream_research
+from src.runtime import BackgroundLoop
+from src.metrics import start_server as start_metrics_server
 
 
 # Page config
@@ -81,16 +83,21 @@ def init_session_state():
         st.session_state.is_researching = False
 
 
-async def run_research_async(query: str):
-    """Run research workflow asynchronously."""
-    initial_state = ResearchState(query=query, current_step="init")
-    final_state = await research_agent.ainvoke(initial_state)
-    return final_state
+@st.cache_resource
+def get_background_loop() -> BackgroundLoop:
+    """
+    Event loop shared by all sessions for the lifetime of the server.
+    
+    Pooled HTTP/LLM clients are bound to the loop they were created on, so a
+    persistent loop keeps them (and their connections) warm across reruns.
+    """
+    return BackgroundLoop()
 
 
-def run_research(query: str):
-    """Run research workflow (sync wrapper)."""
-    return asyncio.run(run_research_async(query))
+def stream_research_events(query: str):
+    """Yield workflow events (see stream_research) from the background loop."""
+    initial_state = ResearchState(query=query, current_step="init")
+    return get_background_loop().iterate(stream_research(initial_state))
 
 
 def display_header():
@@ -200,13 +207,16 @@ def execute_research(query: str):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
+    # (graph nodes, label, description) for each stage; the pipelined graph
+    # runs one research_subtopic branch per subtopic, then merges them
     stages = [
-        ("Planning", "Breaking down query into subtopics...", 20),
-        ("Searching", "Finding relevant sources...", 40),
-        ("Fetching", "Reading full article content...", 60),
-        ("Synthesizing", "Generating comprehensive report...", 80),
-        ("Saving", "Finalizing report with citations...", 100)
+        (("planning",), "Planning", "Breaking down query into subtopics..."),
+        (("search", "research_subtopic"), "Searching", "Finding relevant sources..."),
+        (("fetch", "merge"), "Fetching", "Reading full article content..."),
+        (("synthesis",), "Synthesizing", "Generating comprehensive report..."),
+        (("output",), "Saving", "Finalizing report with citations...")
     ]
+    stage_index = {node: i for i, (nodes, _, _) in enumerate(stages) for node in nodes}
     
     # Create placeholder for stages
     stage_container = st.container()
@@ -214,30 +224,57 @@ def execute_research(query: str):
     with stage_container:
         stage_cols = st.columns(5)
         stage_indicators = []
-        for i, (stage_name, _, _) in enumerate(stages):
+        for i, (_, stage_name, _) in enumerate(stages):
             with stage_cols[i]:
                 indicator = st.empty()
                 stage_indicators.append(indicator)
                 indicator.markdown(f"**{stage_name}**", unsafe_allow_html=True)
     
+    # Live report preview, filled in while the synthesis stage streams
+    report_preview = st.empty()
+    streamed = []
+    last_render = 0.0
+    
+    stage_started = {}
+    
+    def show_current_stage(i: int):
+        _, stage_name, stage_desc = stages[i]
+        stage_started.setdefault(i, time.monotonic())
+        status_text.markdown(f"**{stage_name}**: {stage_desc}")
+        stage_indicators[i].markdown(f"⏳ **{stage_name}**", unsafe_allow_html=True)
+    
     try:
-        # Run research
+        # Run research on the background loop and follow real node completions
         with st.spinner("Agent is working..."):
-            for i, (stage_name, stage_desc, progress) in enumerate(stages):
-                status_text.markdown(f"**{stage_name}**: {stage_desc}")
-                progress_bar.progress(progress)
+            final_state = None
+            show_current_stage(0)
+            
+            for kind, payload in stream_research_events(query):
+                if kind == "update" and payload in stage_index:
+                    # Fan-out nodes report once per branch; the stage time
+                    # runs until the last one finishes
+                    i = stage_index[payload]
+                    stage_started.setdefault(i, time.monotonic())
+                    elapsed = time.monotonic() - stage_started[i]
+                    
+                    stage_indicators[i].markdown(f"✓ {stages[i][1]} ({elapsed:.1f}s)", unsafe_allow_html=True)
+                    progress_bar.progress(int((i + 1) * 100 / len(stages)))
+                    if i + 1 < len(stages) and i + 1 not in stage_started:
+                        show_current_stage(i + 1)
                 
-                # Highlight current stage
-                for j, indicator in enumerate(stage_indicators):
-                    if j == i:
-                        indicator.markdown(f"✓ **{stages[j][0]}**", unsafe_allow_html=True)
-                    elif j < i:
-                        indicator.markdown(f"✓ {stages[j][0]}", unsafe_allow_html=True)
+                elif kind == "token":
+                    streamed.append(payload)
+                    # Throttle re-renders; each one resends the whole markdown block
+                    now = time.monotonic()
+                    if now - last_render >= 0.1:
+                        report_preview.markdown("".join(streamed) + " ▌")
+                        last_render = now
                 
-                # Execute research on last stage
-                if i == len(stages) - 1:
-                    final_state = run_research(query)
+                elif kind == "final":
+                    final_state = payload
             
+            # The full report is shown in the report tabs below
+            report_preview.empty()
             progress_bar.progress(100)
             status_text.markdown("**✓ Research Complete!**")
         
@@ -249,7 +286,8 @@ def execute_research(query: str):
             'citations': final_state.get('citations', []),
             'subtopics': final_state.get('subtopics', []),
             'sources': len(final_state.get('sources', [])),
-            'output_path': final_state.get('output_path', '')
+            'output_path': final_state.get('output_path', ''),
+            'trace': (final_state.get('trace') or {}).get('summary')
         }
         
         st.session_state.research_history.append(research_result)
@@ -295,13 +333,32 @@ def display_report(report: dict):
         </div>
         """.format(len(report.get('citations', []))), unsafe_allow_html=True)
     
+    trace = report.get('trace')
+    
     with col4:
         st.markdown("""
         <div class="metric-card">
-            <div class="metric-value">~30s</div>
+            <div class="metric-value">{}</div>
             <div class="metric-label">Duration</div>
         </div>
-        """, unsafe_allow_html=True)
+        """.format(f"{trace['duration']:.0f}s" if trace else "-"), unsafe_allow_html=True)
+    
+    if trace:
+        with st.expander("Run details"):
+            st.markdown("\n".join(
+                f"- **{name}**: {node['seconds']:.1f}s" + (f" ({node['count']} branches)" if node['count'] > 1 else "")
+                for name, node in trace['nodes'].items()
+            ))
+            calls = trace['calls']
+            detail_cols = st.columns(4)
+            detail_cols[0].metric("LLM tokens", f"{trace['prompt_tokens'] + trace['completion_tokens']:,}")
+            detail_cols[1].metric("Downloaded", f"{trace['bytes_downloaded'] / 1024:.0f} KB")
+            detail_cols[2].metric(
+                "Cache hits",
+                sum(call['cache_hits'] for call in calls.values()),
+                help=", ".join(f"{kind}: {call['cache_hits']}/{call['count']}" for kind, call in calls.items())
+            )
+            detail_cols[3].metric("Queue wait", f"{trace['queue_wait']:.1f}s")
     
     st.markdown("---")
     
@@ -378,6 +435,8 @@ def display_footer():
 
 def main():
     """Main app entry point."""
+    # Serves /metrics when METRICS_PORT is set (started once per process)
+    start_metrics_server()
     init_session_state()
     display_header()
     display_sidebar()
@@ -0,0 +1,103 @@
+"""Fake chat model returning canned planning/synthesis text with configurable latency."""
+import asyncio
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from src.agent_nodes import FINDINGS_MARKER
+
+SUBTOPIC_TEMPLATES = [
+    "Background and key concepts of {query}",
+    "Recent developments in {query}",
+    "Benefits and limitations of {query}",
+    "Practical applications of {query}",
+]
+
+PARAGRAPH = (
+    "The sources describe {topic} from several angles. Reported results agree on the main "
+    "trends, while differing on how quickly they will matter in practice {cite}. Evidence "
+    "from benchmarks and practitioner reports points to clear trade-offs between cost, "
+    "latency and quality {cite}."
+)
+
+
+def respond(prompt: str) -> str:
+    """Canned answer for one of the workflow's prompts."""
+    if "research planning assistant" in prompt:
+        query = re.search(r"Research Query: (.*)", prompt).group(1).strip()
+        subtopics = "\n".join(
+            f"{i}. {template.format(query=query)}" for i, template in enumerate(SUBTOPIC_TEMPLATES, 1)
+        )
+        return f"SUBTOPICS:\n{subtopics}\n\nSEARCH STRATEGY:\nSearch each subtopic and compare recent sources."
+    
+    numbers = sorted(set(re.findall(r"\[Source (\d+)\]", prompt)), key=int) or ["1"]
+    cite = " ".join(f"[Source {n}]" for n in numbers[:3])
+    
+    if "writing one section" in prompt:
+        subtopic = re.search(r"Section Subtopic: (.*)", prompt).group(1).strip()
+        return f"### {subtopic}\n\n" + "\n\n".join(PARAGRAPH.format(topic=subtopic, cite=cite) for _ in range(3))
+    
+    if "finishing a research report" in prompt:
+        return (
+            f"## Executive Summary\n{PARAGRAPH.format(topic='the question', cite=cite)}\n\n"
+            f"{FINDINGS_MARKER}\n\n"
+            f"## Key Insights\n{PARAGRAPH.format(topic='the findings', cite=cite)}\n\n"
+            f"## Conclusion\n{PARAGRAPH.format(topic='the outlook', cite=cite)}"
+        )
+    
+    subtopics = re.findall(r"^- (.+)$", prompt, re.MULTILINE) or ["the query"]
+    findings = "\n\n".join(
+        f"### {subtopic}\n\n{PARAGRAPH.format(topic=subtopic, cite=cite)}" for subtopic in subtopics
+    )
+    return (
+        f"## Executive Summary\n\n{PARAGRAPH.format(topic='the question', cite=cite)}\n\n"
+        f"## Detailed Findings\n\n{findings}\n\n"
+        f"## Key Insights\n\n{PARAGRAPH.format(topic='the findings', cite=cite)}\n\n"
+        f"## Conclusion\n\n{PARAGRAPH.format(topic='the outlook', cite=cite)}"
+    )
+
+
+class FakeLLM(BaseChatModel):
+    """
+    Chat model with canned answers for the workflow's prompts.
+    
+    Every call takes `latency` seconds; streamed calls spread it over
+    `chunks` chunks, so time-to-first-token is latency / chunks.
+    """
+    
+    latency: float = 0.0
+    chunks: int = 20
+    
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+    
+    def _pieces(self, messages: List[BaseMessage]) -> List[str]:
+        text = respond(messages[-1].content)
+        size = max(1, -(-len(text) // max(1, self.chunks)))
+        return [text[i:i + size] for i in range(0, len(text), size)]
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=respond(messages[-1].content)))])
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=respond(messages[-1].content)))])
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        pieces = self._pieces(messages)
+        for piece in pieces:
+            time.sleep(self.latency / len(pieces))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        pieces = self._pieces(messages)
+        for piece in pieces:
+            await asyncio.sleep(self.latency / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
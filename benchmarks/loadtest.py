@@ -0,0 +1,302 @@
+"""
+Concurrent load test of the research workflow against local stand-in servers.
+
+Starts the stand-ins from benchmarks.servers (Tavily-compatible search,
+article pages and an OpenAI-compatible chat endpoint) in a child process,
+points the real clients at them through TAVILY_API_BASE_URL and
+OPENAI_BASE_URL, and drives concurrent research_agent.ainvoke runs. Unlike
+benchmarks.run, everything above the sockets is the production code path:
+the Tavily client and its thread pool, the pooled page fetcher, extraction,
+and ChatOpenAI with streaming.
+
+Reports p50/p95/p99 per stage (workflow nodes, plus individual searches,
+page fetches and LLM calls), per-run latency, runs per second and
+event-loop lag.
+
+Usage (from the project root):
+    python -m benchmarks.loadtest --concurrency 8 --runs 32
+    python -m benchmarks.loadtest --llm-latency 2 --page-latency 0.5 --page-error-rate 0.1
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.servers import StandInConfig, StandInProcess
+from benchmarks.stats import summarize
+
+QUERIES = [
+    "Compare State Space Models vs Transformers in 2026",
+    "What are the latest developments in quantum computing?",
+    "How does the Model Context Protocol work?",
+    "Benefits and risks of retrieval-augmented generation",
+    "Current state of solid-state battery research",
+    "How are large language models evaluated in production?",
+]
+
+NODE_FUNCTIONS = (
+    "planning_node",
+    "speculative_search_node",
+    "search_node",
+    "fetch_node",
+    "subtopic_research_node",
+    "merge_node",
+    "synthesis_node",
+    "output_node",
+)
+
+# Interval of the event-loop lag probe (seconds)
+LAG_INTERVAL = 0.01
+
+
+def configure_environment(urls: Dict[str, Any], keep_caches: bool):
+    """Point the settings at the stand-ins; must run before src is imported."""
+    os.environ.update({
+        "TAVILY_API_KEY": "load-test",
+        "OPENAI_API_KEY": "load-test",
+        "ANTHROPIC_API_KEY": "",
+        "GOOGLE_API_KEY": "",
+        "TAVILY_API_BASE_URL": urls["search"],
+        "OPENAI_BASE_URL": urls["llm"],
+        "DEBUG": "false",
+    })
+    # The stand-ins are on loopback; keep any configured proxy out of the way
+    for name in ("NO_PROXY", "no_proxy"):
+        os.environ[name] = ",".join(filter(None, [os.environ.get(name), "127.0.0.1", "localhost"]))
+    
+    if not keep_caches:
+        import tempfile
+        os.environ.update({
+            "CACHE_DIR": tempfile.mkdtemp(prefix="research-loadtest-"),
+            "SEARCH_CACHE_TTL": "0",
+            "PAGE_CACHE_ENABLED": "false",
+            "CORPUS_ENABLED": "false",
+            "LLM_CACHE_NODES": "",
+        })
+
+
+class StageTimer:
+    """Collects per-stage latency samples from wrapped coroutines and LLM callbacks."""
+    
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+    
+    def wrap(self, name: str, function):
+        @functools.wraps(function)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            except Exception:
+                self.errors[name] += 1
+                raise
+            finally:
+                self.samples[name].append(time.perf_counter() - start)
+        return timed
+    
+    def callback_handler(self):
+        """LangChain callback handler timing every LLM call made during a run."""
+        from langchain_core.callbacks import AsyncCallbackHandler
+        
+        timer = self
+        
+        class LLMTimer(AsyncCallbackHandler):
+            def __init__(self):
+                self.started: Dict[Any, float] = {}
+            
+            async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+                self.started[run_id] = time.perf_counter()
+            
+            async def on_llm_end(self, response, *, run_id, **kwargs):
+                start = self.started.pop(run_id, None)
+                if start is not None:
+                    timer.samples["llm_call"].append(time.perf_counter() - start)
+            
+            async def on_llm_error(self, error, *, run_id, **kwargs):
+                self.started.pop(run_id, None)
+                timer.errors["llm_call"] += 1
+        
+        return LLMTimer()
+
+
+def instrument(timer: StageTimer):
+    """Wrap workflow nodes, searches and fetches with timers (before src.workflow is imported)."""
+    import src.agent_nodes as nodes
+    from src.mcp_tools import web_search, web_fetch
+    
+    for name in NODE_FUNCTIONS:
+        setattr(nodes, name, timer.wrap(f"node/{name[:-len('_node')]}", getattr(nodes, name)))
+    
+    web_search.search = timer.wrap("search", web_search.search)
+    web_fetch.fetch = timer.wrap("fetch", web_fetch.fetch)
+
+
+async def monitor_loop_lag(samples: List[float], stop: asyncio.Event):
+    """Record how late the loop wakes a LAG_INTERVAL sleep (time callbacks spent queued)."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, time.perf_counter() - start - LAG_INTERVAL))
+
+
+async def drive(args: argparse.Namespace, timer: StageTimer) -> Dict[str, Any]:
+    from src.state import ResearchState
+    from src.workflow import research_agent
+    from src.mcp_tools import web_fetch
+    from src.llm import llm_clients
+    
+    run_samples: List[float] = []
+    failures: List[str] = []
+    fallbacks = {"mock_sources": 0, "runs_with_errors": 0}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    handler = timer.callback_handler()
+    
+    async def one_run(i: int):
+        query = QUERIES[i % len(QUERIES)]
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await research_agent.ainvoke(
+                    ResearchState(query=query, current_step="init"),
+                    config={"callbacks": [handler]}
+                )
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+                return
+            run_samples.append(time.perf_counter() - start)
+        
+        # Search and fetch failures degrade to placeholder content rather than raising
+        sources = result.get("sources", [])
+        fallbacks["mock_sources"] += sum(1 for source in sources if "example.com" in source.url)
+        if result.get("errors"):
+            fallbacks["runs_with_errors"] += 1
+    
+    lag: List[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(lag, stop))
+    
+    try:
+        # Warm-up runs are untimed: they open connection pools and load models
+        for i in range(args.warmup):
+            await one_run(i)
+        run_samples.clear()
+        failures.clear()
+        timer.samples.clear()
+        timer.errors.clear()
+        lag.clear()
+        fallbacks = dict.fromkeys(fallbacks, 0)
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(one_run(i) for i in range(args.runs)))
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        await lag_task
+        await web_fetch.aclose()
+        await llm_clients.aclose()
+    
+    return {
+        "elapsed_s": elapsed,
+        "completed": len(run_samples),
+        "failed": len(failures),
+        "runs_per_s": len(run_samples) / elapsed if elapsed else 0.0,
+        "run": summarize(run_samples) if run_samples else None,
+        "stages": {name: summarize(samples) for name, samples in sorted(timer.samples.items())},
+        "stage_errors": dict(timer.errors),
+        "fallbacks": fallbacks,
+        "loop_lag": summarize(lag) if lag else None,
+        "failures": failures[:20],
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    header = f"{'stage':<28} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    lines = [header, "-" * len(header)]
+    
+    def row(name: str, r: Optional[Dict[str, Any]]):
+        if r:
+            lines.append(
+                f"{name:<28} {r['iterations']:>7} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+                f"{r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}"
+            )
+    
+    for name, r in report["stages"].items():
+        row(name, r)
+    lines.append("")
+    row("run", report["run"])
+    row("event loop lag", report["loop_lag"])
+    lines.append("")
+    lines.append(
+        f"{report['completed']} runs in {report['elapsed_s']:.1f}s "
+        f"({report['runs_per_s']:.2f} runs/s), {report['failed']} failed"
+    )
+    if report["stage_errors"]:
+        lines.append("Stage errors: " + ", ".join(f"{k}={v}" for k, v in sorted(report["stage_errors"].items())))
+    lines.append(
+        f"Placeholder sources (search/fetch fallbacks): {report['fallbacks']['mock_sources']}, "
+        f"runs with errors: {report['fallbacks']['runs_with_errors']}"
+    )
+    for failure in report["failures"]:
+        lines.append(f"  {failure}")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Concurrent load test against local stand-in servers")
+    parser.add_argument("--concurrency", type=int, default=8, help="research runs in flight at once")
+    parser.add_argument("--runs", type=int, default=32, help="timed research runs in total")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs before timing")
+    parser.add_argument("--keep-caches", action="store_true", help="leave search/page/LLM caches and the corpus on")
+    parser.add_argument("--output", type=Path, help="write results as JSON to this file")
+    
+    servers = parser.add_argument_group("stand-in servers")
+    defaults = StandInConfig()
+    servers.add_argument("--search-latency", type=float, default=defaults.search_latency, help="seconds per search")
+    servers.add_argument("--search-error-rate", type=float, default=defaults.search_error_rate)
+    servers.add_argument("--page-latency", type=float, default=defaults.page_latency, help="seconds before a page is sent")
+    servers.add_argument("--page-error-rate", type=float, default=defaults.page_error_rate)
+    servers.add_argument("--page-size", type=int, default=defaults.page_size, help="approximate page size in bytes")
+    servers.add_argument("--page-hosts", type=int, default=defaults.page_hosts, help="distinct article hosts")
+    servers.add_argument("--llm-latency", type=float, default=defaults.llm_latency, help="seconds per LLM response")
+    servers.add_argument("--llm-error-rate", type=float, default=defaults.llm_error_rate)
+    servers.add_argument("--llm-chunks", type=int, default=defaults.llm_chunks, help="chunks per streamed response")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    server_config = StandInConfig(**{
+        field: getattr(args, field) for field in asdict(StandInConfig())
+    })
+    
+    servers = StandInProcess(server_config)
+    try:
+        configure_environment(servers.urls, args.keep_caches)
+        timer = StageTimer()
+        instrument(timer)
+        print(
+            f"Load test: {args.runs} runs at concurrency {args.concurrency} "
+            f"(search {servers.urls['search']}, LLM {servers.urls['llm']})",
+            file=sys.stderr
+        )
+        report = asyncio.run(drive(args, timer))
+    finally:
+        servers.stop()
+    
+    report["settings"] = {"concurrency": args.concurrency, "runs": args.runs, **asdict(server_config)}
+    print(format_report(report))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
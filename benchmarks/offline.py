@@ -0,0 +1,89 @@
+"""Offline environment for benchmarks: mock search, fixture-backed fetches and a fake LLM."""
+import asyncio
+import os
+import re
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Dict
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+def configure_environment() -> str:
+    """
+    Point the settings at an offline, cache-free setup.
+    
+    Must run before anything from src is imported, since src.config reads the
+    environment at import time. Returns the temporary cache directory.
+    """
+    cache_dir = tempfile.mkdtemp(prefix="research-bench-")
+    os.environ.update({
+        # Empty keys keep load_dotenv from enabling live providers
+        "TAVILY_API_KEY": "",
+        "OPENAI_API_KEY": "",
+        "ANTHROPIC_API_KEY": "",
+        "GOOGLE_API_KEY": "",
+        "DEBUG": "false",
+        "CACHE_DIR": cache_dir,
+        "SEARCH_CACHE_TTL": "0",
+        "PAGE_CACHE_ENABLED": "false",
+        "CORPUS_ENABLED": "false",
+        "LLM_CACHE_NODES": "",
+    })
+    return cache_dir
+
+
+def load_fixtures() -> Dict[str, str]:
+    """HTML fixtures by file name."""
+    return {
+        path.name: path.read_text(encoding="utf-8")
+        for path in sorted(FIXTURES_DIR.glob("*.html"))
+    }
+
+
+def fixture_transport(fixtures: Dict[str, str], latency: float = 0.0):
+    """
+    httpx transport answering every URL with one of the fixtures.
+    
+    URLs ending in a number (like the mock search results' article-N) get
+    fixture N, others one picked by a hash of the URL, so a URL always gets
+    the same page and the mock articles get different ones.
+    """
+    import httpx
+    
+    pages = [fixtures[name].encode("utf-8") for name in sorted(fixtures)]
+    
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        number = re.search(r"(\d+)/?$", request.url.path)
+        index = int(number.group(1)) - 1 if number else zlib.crc32(str(request.url).encode())
+        page = pages[index % len(pages)]
+        return httpx.Response(200, headers={"Content-Type": "text/html; charset=utf-8"}, content=page)
+    
+    return httpx.MockTransport(handler)
+
+
+def install(llm_latency: float = 0.0, search_latency: float = 0.0, fetch_latency: float = 0.0, llm_chunks: int = 20):
+    """Route the workflow's LLM, search and fetch calls to the offline backends."""
+    import src.agent_nodes as nodes
+    from src.mcp_tools import web_search, web_fetch
+    from benchmarks.fake_llm import FakeLLM
+    
+    def get_fake_llm(temperature: float = 0.7, **options):
+        return FakeLLM(latency=llm_latency, chunks=llm_chunks)
+    
+    nodes.get_llm = get_fake_llm
+    
+    # Without an API key, search() answers from _mock_search
+    if search_latency:
+        mock_search = web_search.search
+        
+        async def slow_search(query: str, max_results: int = 10):
+            await asyncio.sleep(search_latency)
+            return await mock_search(query, max_results)
+        
+        web_search.search = slow_search
+    
+    web_fetch.transport = fixture_transport(load_fixtures(), fetch_latency)
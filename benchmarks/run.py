@@ -0,0 +1,286 @@
+"""
+Offline benchmark suite for the research workflow.
+
+Runs without network access or API keys: search uses the built-in mock
+results, pages are served from the HTML fixtures in benchmarks/fixtures
+through an in-process httpx transport, and the LLM is a fake model with
+configurable latency. Persistent caches and the local corpus are disabled.
+
+Usage (from the project root):
+    python -m benchmarks.run
+    python -m benchmarks.run --iterations 50 --llm-latency 0.2 --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+    python -m benchmarks.run --only extraction
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.offline import configure_environment, install, load_fixtures
+
+# Settings are read when src is imported, so the offline environment goes first
+configure_environment()
+
+from benchmarks.stats import summarize, format_table, compare
+from src import config
+from src.state import ResearchState
+from src.extractors import extract_text
+from src.mcp_tools import web_fetch
+from src.workflow import create_research_workflow
+import src.agent_nodes as nodes
+
+SUITES = ("nodes", "workflow", "extraction")
+
+DEFAULT_QUERY = "Compare State Space Models vs Transformers in 2026"
+
+# Fields merged with operator.add in ResearchState
+ADDITIVE_FIELDS = ("search_queries", "errors", "branch_sources", "branch_fetched")
+
+# Size the large fixture is grown to, so extraction takes the process-pool path
+LARGE_PAGE_BYTES = max(config.EXTRACT_PROCESS_THRESHOLD * 2, 400_000)
+
+
+async def measure(
+    name: str,
+    run: Callable[[], Awaitable[Any]],
+    iterations: int,
+    warmup: int,
+    prepare: Optional[Callable[[], Any]] = None,
+    bytes_processed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Time `iterations` calls of run (after `warmup` untimed ones), then repeat
+    one call under tracemalloc for its peak memory.
+    
+    prepare() runs untimed before every call and its result is passed to run.
+    """
+    async def once() -> float:
+        argument = prepare() if prepare else None
+        start = time.perf_counter()
+        await (run(argument) if prepare else run())
+        return time.perf_counter() - start
+    
+    for _ in range(warmup):
+        await once()
+    samples = [await once() for _ in range(iterations)]
+    
+    tracemalloc.start()
+    try:
+        await once()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    print(f"  {name}: p50 {sorted(samples)[len(samples) // 2] * 1000:.2f} ms", file=sys.stderr)
+    return summarize(samples, peak, bytes_processed)
+
+
+def apply(state: ResearchState, update: Dict[str, Any]) -> ResearchState:
+    """Apply a node's update the way the graph would (additive fields are appended)."""
+    values = dict(update)
+    for field in ADDITIVE_FIELDS:
+        if field in values:
+            values[field] = getattr(state, field) + values[field]
+    return state.model_copy(update=values, deep=True)
+
+
+def copier(state: ResearchState) -> Callable[[], ResearchState]:
+    """Fresh deep copy per iteration, since nodes fill in Source content in place."""
+    return lambda: state.model_copy(deep=True)
+
+
+async def node_benchmarks(query: str, iterations: int, warmup: int) -> Dict[str, Dict[str, Any]]:
+    """Each workflow node on realistic input, built by running the preceding nodes once."""
+    results = {}
+    
+    initial = ResearchState(query=query, current_step="init")
+    planned = apply(initial, await nodes.planning_node(initial.model_copy(deep=True)))
+    
+    # Linear graph: search -> fetch
+    searched = apply(planned, await nodes.search_node(planned.model_copy(deep=True)))
+    fetched_linear = apply(searched, await nodes.fetch_node(searched.model_copy(deep=True)))
+    
+    # Pipelined graph: one research branch per subtopic -> merge
+    branch = planned.model_copy(update={"subtopic": planned.subtopics[0]}, deep=True)
+    branched = planned
+    for subtopic in planned.subtopics:
+        branch_input = planned.model_copy(update={"subtopic": subtopic}, deep=True)
+        branched = apply(branched, await nodes.subtopic_research_node(branch_input))
+    merged = apply(branched, await nodes.merge_node(branched.model_copy(deep=True)))
+    
+    synthesized = apply(merged, await nodes.synthesis_node(merged.model_copy(deep=True)))
+    
+    cases = [
+        ("node/planning", nodes.planning_node, initial),
+        ("node/speculative_search", nodes.speculative_search_node, initial),
+        ("node/search", nodes.search_node, planned),
+        ("node/fetch", nodes.fetch_node, searched),
+        ("node/research_subtopic", nodes.subtopic_research_node, branch),
+        ("node/merge", nodes.merge_node, branched),
+        ("node/synthesis", nodes.synthesis_node, merged),
+        ("node/synthesis_linear", nodes.synthesis_node, fetched_linear),
+        ("node/output", nodes.output_node, synthesized),
+    ]
+    for name, node, state in cases:
+        results[name] = await measure(name, node, iterations, warmup, prepare=copier(state))
+    
+    return results
+
+
+async def workflow_benchmarks(query: str, iterations: int, warmup: int) -> Dict[str, Dict[str, Any]]:
+    """End-to-end runs of both graph layouts."""
+    results = {}
+    for name, pipelined in (("workflow/pipelined", True), ("workflow/linear", False)):
+        graph = create_research_workflow(pipelined=pipelined, speculative=config.SPECULATIVE_SEARCH)
+        results[name] = await measure(
+            name,
+            lambda state, graph=graph: graph.ainvoke(state),
+            iterations,
+            warmup,
+            prepare=lambda: ResearchState(query=query, current_step="init")
+        )
+    return results
+
+
+async def extraction_benchmarks(iterations: int, warmup: int) -> Dict[str, Dict[str, Any]]:
+    """Extractor backends per fixture, the fetcher's pooled extraction and a full page fetch."""
+    results = {}
+    fixtures = load_fixtures()
+    
+    # A long article page, large enough for the process pool
+    article = fixtures["news_article.html"]
+    head, body = article.split('<div class="story-body">', 1)
+    story, tail = body.split("</div>", 1)
+    repeats = LARGE_PAGE_BYTES // len(story) + 1
+    fixtures["large_page.html"] = f'{head}<div class="story-body">{story * repeats}</div>{tail}'
+    
+    for fixture, html in fixtures.items():
+        size = len(html.encode("utf-8"))
+        for backend in ("lxml", "html2text"):
+            name = f"extract/{backend}/{fixture}"
+            
+            async def run(html=html, backend=backend):
+                extract_text(html, config.EXTRACT_MAX_CHARS, backend)
+            
+            results[name] = await measure(name, run, iterations, warmup, bytes_processed=size)
+        
+        name = f"fetch_extract/{fixture}"
+        results[name] = await measure(
+            name, lambda html=html: web_fetch.extract(html), iterations, warmup, bytes_processed=size
+        )
+    
+    # Full fetch path over the fixture transport (a new URL each time, so
+    # single-flight never short-circuits)
+    counter = iter(range(10**9))
+    results["fetch_page"] = await measure(
+        "fetch_page",
+        lambda url: web_fetch.fetch(url),
+        iterations,
+        warmup,
+        prepare=lambda: f"https://bench.example.com/page-{next(counter)}"
+    )
+    
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    install(
+        llm_latency=args.llm_latency,
+        search_latency=args.search_latency,
+        fetch_latency=args.fetch_latency
+    )
+    
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        if "nodes" in args.only:
+            results.update(await node_benchmarks(args.query, args.iterations, args.warmup))
+        if "workflow" in args.only:
+            results.update(await workflow_benchmarks(args.query, args.iterations, args.warmup))
+        if "extraction" in args.only:
+            results.update(await extraction_benchmarks(args.iterations, args.warmup))
+    finally:
+        await web_fetch.aclose()
+    
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "query": args.query,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "llm_latency": args.llm_latency,
+            "search_latency": args.search_latency,
+            "fetch_latency": args.fetch_latency,
+            "settings": {
+                "PIPELINE_SUBTOPICS": config.PIPELINE_SUBTOPICS,
+                "SPECULATIVE_SEARCH": config.SPECULATIVE_SEARCH,
+                "SYNTHESIS_MODE": config.SYNTHESIS_MODE,
+                "SOURCE_SELECTION": config.SOURCE_SELECTION,
+                "EXTRACT_BACKEND": config.EXTRACT_BACKEND,
+                "EXTRACT_MAX_CHARS": config.EXTRACT_MAX_CHARS,
+                "SYNTHESIS_CONTEXT_TOKENS": config.SYNTHESIS_CONTEXT_TOKENS,
+            },
+        },
+        "benchmarks": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the research workflow")
+    parser.add_argument("--iterations", type=int, default=20, help="timed iterations per benchmark")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed iterations before timing")
+    parser.add_argument("--query", default=DEFAULT_QUERY, help="research query to benchmark with")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per fake LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="seconds per mock search")
+    parser.add_argument("--fetch-latency", type=float, default=0.0, help="seconds per fixture fetch")
+    parser.add_argument(
+        "--only",
+        type=lambda value: [suite.strip() for suite in value.split(",")],
+        default=list(SUITES),
+        help=f"comma-separated suites to run ({', '.join(SUITES)})"
+    )
+    parser.add_argument("--output", type=Path, help="write results as JSON to this file")
+    parser.add_argument("--compare", type=Path, help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+    
+    unknown = set(args.only) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmarks(args))
+    
+    print(format_table(report["benchmarks"]))
+    if args.compare:
+        print()
+        print(compare(args.compare, report["benchmarks"]))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Local stand-in HTTP servers for load tests.
+
+- search: Tavily-compatible POST /search
+- pages: article pages (GET /articles/<id>) with configurable size, spread
+  over several ports so per-host connection limits behave as with real sites
+- llm: OpenAI-compatible POST /v1/chat/completions (streaming and not)
+
+Each server has its own latency and error rate. The servers use blocking
+threads and normally run in a separate process (see StandInProcess) so
+they do not compete with the client's event loop for the GIL.
+
+Standalone use:
+    python -m benchmarks.servers --llm-latency 0.5 --page-latency 0.1
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.offline import load_fixtures
+
+# Distinct articles the search server draws its results from; overlapping
+# queries share results, as with a real search engine
+ARTICLE_POOL = 500
+
+VOCABULARY = """
+model models attention transformer state space sequence length memory compute inference training
+data benchmark benchmarks results latency throughput cost hardware accelerator kernel scan linear
+quadratic context window retrieval agent agents tool tools protocol server client search fetch
+cache caching evaluation quality report source sources citation research team paper study
+performance production deployment users requests concurrency pipeline stage token tokens budget
+open specification security prompt injection adoption editors frameworks developers practice
+""".split()
+
+
+@dataclass
+class StandInConfig:
+    search_latency: float = 0.3
+    search_error_rate: float = 0.0
+    page_latency: float = 0.2
+    page_error_rate: float = 0.0
+    page_size: int = 60_000
+    page_hosts: int = 4
+    llm_latency: float = 1.0
+    llm_error_rate: float = 0.0
+    llm_chunks: int = 40
+
+
+def article_text(article_id: int, paragraphs: int) -> List[str]:
+    """Deterministic, article-specific paragraphs (distinct enough not to be deduplicated)."""
+    rng = random.Random(article_id)
+    return [
+        " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(60, 110))).capitalize() + "."
+        for _ in range(paragraphs)
+    ]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: StandInConfig = StandInConfig()
+    page_urls: List[str] = []
+    template: Tuple[str, str] = ("", "")
+    
+    def log_message(self, format: str, *args: Any):
+        pass
+    
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        self._send(status, json.dumps(payload).encode(), "application/json")
+    
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+    
+    def _fails(self, rate: float) -> bool:
+        return rate > 0 and random.random() < rate
+    
+    def do_GET(self):
+        match = re.fullmatch(r"/articles/(\d+)", self.path)
+        if not match:
+            self._send(404, b"not found", "text/plain")
+            return
+        
+        time.sleep(self.config.page_latency)
+        if self._fails(self.config.page_error_rate):
+            self._send(503, b"unavailable", "text/plain")
+            return
+        
+        article_id = int(match.group(1))
+        head, tail = self.template
+        body = ""
+        paragraphs = article_text(article_id, max(1, self.config.page_size // 600))
+        for paragraph in paragraphs:
+            if len(head) + len(body) + len(tail) >= self.config.page_size:
+                break
+            body += f"<p>{paragraph}</p>\n"
+        html = head.replace("{title}", f"Article {article_id}") + body + tail
+        self._send(200, html.encode(), "text/html; charset=utf-8")
+    
+    def do_POST(self):
+        if self.path.rstrip("/") == "/search":
+            self._search()
+        elif self.path.rstrip("/").endswith("/chat/completions"):
+            self._chat()
+        else:
+            self._send(404, b"not found", "text/plain")
+    
+    def _search(self):
+        request = self._read_json()
+        time.sleep(self.config.search_latency)
+        if self._fails(self.config.search_error_rate):
+            self._send_json(429, {"detail": {"error": "rate limited"}})
+            return
+        
+        query = request.get("query", "")
+        max_results = int(request.get("max_results") or 5)
+        start = zlib.crc32(query.encode())
+        results = []
+        for i in range(max_results):
+            article_id = (start + i * 37) % ARTICLE_POOL
+            host = self.page_urls[article_id % len(self.page_urls)]
+            text = " ".join(article_text(article_id, 2))
+            result = {
+                "url": f"{host}/articles/{article_id}",
+                "title": f"Article {article_id}: {query[:60]}",
+                "content": text[:400],
+                "score": round(0.95 - i * 0.05, 2),
+            }
+            if request.get("include_raw_content"):
+                result["raw_content"] = text
+            results.append(result)
+        
+        self._send_json(200, {"query": query, "results": results, "response_time": self.config.search_latency})
+    
+    def _chat(self):
+        # Imported here: fake_llm imports src, whose settings the load test
+        # sets only after these servers are started
+        from benchmarks.fake_llm import respond
+        
+        request = self._read_json()
+        if self._fails(self.config.llm_error_rate):
+            time.sleep(self.config.llm_latency / 10)
+            self._send_json(500, {"error": {"message": "stand-in failure", "type": "server_error"}})
+            return
+        
+        prompt = request["messages"][-1]["content"]
+        if isinstance(prompt, list):
+            prompt = "".join(block.get("text", "") for block in prompt)
+        text = respond(prompt)
+        model = request.get("model", "stand-in")
+        created = int(time.time())
+        
+        if not request.get("stream"):
+            time.sleep(self.config.llm_latency)
+            self._send_json(200, {
+                "id": "chatcmpl-standin",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4, "total_tokens": (len(prompt) + len(text)) // 4},
+            })
+            return
+        
+        # Server-sent events over a chunked response
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        def event(delta: Dict[str, Any], finish_reason=None):
+            payload = {
+                "id": "chatcmpl-standin",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+        
+        chunks = max(1, self.config.llm_chunks)
+        size = max(1, -(-len(text) // chunks))
+        event({"role": "assistant", "content": ""})
+        for i in range(0, len(text), size):
+            time.sleep(self.config.llm_latency / chunks)
+            event({"content": text[i:i + size]})
+        event({}, finish_reason="stop")
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+    
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def page_template() -> Tuple[str, str]:
+    """News fixture split around its story body, for wrapping generated paragraphs."""
+    html = load_fixtures()["news_article.html"]
+    head, rest = html.split('<div class="story-body">', 1)
+    _, tail = rest.split("</div>", 1)
+    head = re.sub(r"<title>.*?</title>", "<title>{title}</title>", head, flags=re.S)
+    head = re.sub(r"<h1>.*?</h1>", "<h1>{title}</h1>", head, flags=re.S)
+    return head + '<div class="story-body">\n', "</div>" + tail
+
+
+def start_servers(config: StandInConfig, host: str = "127.0.0.1") -> Dict[str, Any]:
+    """Start all servers on free ports in daemon threads and return their base URLs."""
+    def serve(handler) -> str:
+        server = ThreadingHTTPServer((host, 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return f"http://{host}:{server.server_address[1]}"
+    
+    pages = type("PageHandler", (StandInHandler,), {"config": config, "template": page_template()})
+    page_urls = [serve(pages) for _ in range(max(1, config.page_hosts))]
+    
+    handler = type("ApiHandler", (StandInHandler,), {"config": config, "page_urls": page_urls})
+    return {
+        "search": serve(handler),
+        "llm": serve(handler) + "/v1",
+        "pages": page_urls,
+    }
+
+
+def _serve_in_process(config: Dict[str, Any], urls: "multiprocessing.Queue", stop: "multiprocessing.Event"):
+    urls.put(start_servers(StandInConfig(**config)))
+    stop.wait()
+
+
+class StandInProcess:
+    """The stand-in servers running in a child process."""
+    
+    def __init__(self, config: StandInConfig):
+        context = multiprocessing.get_context("spawn")
+        self._stop = context.Event()
+        queue = context.Queue()
+        self._process = context.Process(
+            target=_serve_in_process, args=(asdict(config), queue, self._stop), daemon=True
+        )
+        self._process.start()
+        self.urls: Dict[str, Any] = queue.get(timeout=30)
+    
+    def stop(self):
+        self._stop.set()
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the load-test stand-in servers")
+    for field, default in asdict(StandInConfig()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args()
+    
+    urls = start_servers(StandInConfig(**vars(args)))
+    print(f"TAVILY_API_BASE_URL={urls['search']}")
+    print(f"OPENAI_BASE_URL={urls['llm']}")
+    print(f"Article hosts: {', '.join(urls['pages'])}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
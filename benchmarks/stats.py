@@ -0,0 +1,62 @@
+"""Summary statistics and result comparison for benchmark runs."""
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def summarize(
+    samples: List[float],
+    peak_memory: Optional[int] = None,
+    bytes_processed: Optional[int] = None
+) -> Dict[str, Any]:
+    """Latency distribution (ms), throughput and peak traced memory for one benchmark."""
+    times = np.array(samples)
+    total = float(times.sum())
+    summary = {
+        "iterations": len(samples),
+        "mean_ms": float(times.mean()) * 1000,
+        "stdev_ms": float(times.std()) * 1000,
+        "min_ms": float(times.min()) * 1000,
+        "max_ms": float(times.max()) * 1000,
+    }
+    for p, value in zip(PERCENTILES, np.percentile(times, PERCENTILES)):
+        summary[f"p{p}_ms"] = float(value) * 1000
+    summary["throughput_per_s"] = len(samples) / total if total else 0.0
+    if bytes_processed is not None:
+        summary["mb_per_s"] = bytes_processed * len(samples) / total / 1e6 if total else 0.0
+    if peak_memory is not None:
+        summary["peak_memory_kb"] = peak_memory / 1024
+    return summary
+
+
+def format_table(results: Dict[str, Dict[str, Any]]) -> str:
+    """Human-readable summary of benchmark results."""
+    header = f"{'benchmark':<40} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'peak KB':>9}"
+    lines = [header, "-" * len(header)]
+    for name, r in results.items():
+        lines.append(
+            f"{name:<40} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+            f"{r['throughput_per_s']:>9.1f} {r.get('peak_memory_kb', 0):>9.0f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(baseline_path: Path, results: Dict[str, Dict[str, Any]]) -> str:
+    """p50/p95 changes against a previous JSON result file (negative is faster)."""
+    baseline = json.loads(Path(baseline_path).read_text())["benchmarks"]
+    header = f"{'benchmark':<40} {'p50 before':>11} {'p50 after':>10} {'change':>8} {'p95 change':>11}"
+    lines = [header, "-" * len(header)]
+    for name, r in results.items():
+        before = baseline.get(name)
+        if before is None:
+            lines.append(f"{name:<40} {'-':>11} {r['p50_ms']:>10.2f} {'new':>8}")
+            continue
+        p50_change = (r["p50_ms"] / before["p50_ms"] - 1) * 100 if before["p50_ms"] else 0.0
+        p95_change = (r["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+        lines.append(
+            f"{name:<40} {before['p50_ms']:>11.2f} {r['p50_ms']:>10.2f} {p50_change:>+7.1f}% {p95_change:>+10.1f}%"
+        )
+    return "\n".join(lines)
@@ -1,7 +1,14 @@
 """Main CLI interface for the Research Assistant Agent."""
+import argparse
 import asyncio
+import sys
+from pathlib import Path
+from typing import Callable, List, Optional
 from src.state import ResearchState
-from src.workflow import research_agent
+from src.workflow import research_agent, stream_research
+from src.mcp_tools import web_fetch
+from src.llm import llm_clients
+from src.tracing import format_summary
 from src.config import DEBUG
 
 
@@ -15,12 +22,13 @@ def print_banner():
 """)
 
 
-async def run_research(query: str) -> ResearchState:
+async def run_research(query: str, on_token: Optional[Callable[[str], None]] = None) -> ResearchState:
     """
     Execute research workflow for a given query.
     
     Args:
         query: The research question to investigate
+        on_token: Optional callback receiving report text as it is generated
         
     Returns:
         Final ResearchState with results
@@ -36,7 +44,14 @@ async def run_research(query: str) -> ResearchState:
         print(f"\n🚀 Starting research workflow for: '{query}'\n")
         print("=" * 60)
     
-    final_state = await research_agent.ainvoke(initial_state)
+    if on_token is None:
+        final_state = await research_agent.ainvoke(initial_state)
+    else:
+        async for kind, payload in stream_research(initial_state):
+            if kind == "token":
+                on_token(payload)
+            elif kind == "final":
+                final_state = payload
     
     if DEBUG:
         print("=" * 60)
@@ -45,15 +60,47 @@ async def run_research(query: str) -> ResearchState:
     return final_state
 
 
-def main():
+async def run_research_once(query: str, on_token: Optional[Callable[[str], None]] = None) -> ResearchState:
+    """Run a single research workflow and close pooled clients afterwards."""
+    try:
+        return await run_research(query, on_token=on_token)
+    finally:
+        await web_fetch.aclose()
+        await llm_clients.aclose()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Research Assistant Agent")
+    parser.add_argument("query", nargs="?", help="research query (prompted for when omitted)")
+    
+    profiling = parser.add_argument_group("profiling")
+    profiling.add_argument(
+        "--profile", action="store_true",
+        help="profile the run (CPU, per-node stack samples, slow asyncio callbacks)"
+    )
+    profiling.add_argument("--profile-dir", type=Path, help="where to write the profile (default reports/profiles/<time>)")
+    profiling.add_argument("--profile-interval", type=float, default=0.005, help="stack sampling interval in seconds")
+    profiling.add_argument(
+        "--slow-callback", type=float, default=0.1,
+        help="report event-loop callbacks blocking longer than this many seconds"
+    )
+    profiling.add_argument(
+        "--trace-malloc", type=int, default=0, metavar="N",
+        help="also track allocations, keeping the top N sites per node"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
     """Main CLI entry point."""
+    args = parse_args(argv)
     print_banner()
     
     print("Welcome to the Research Assistant Agent!")
     print("This AI agent will research any topic and generate a comprehensive report.\n")
     
     # Get user input
-    query = input("Enter your research query: ").strip()
+    query = (args.query or input("Enter your research query: ")).strip()
     
     if not query:
         print("❌ No query provided. Exiting.")
@@ -62,17 +109,46 @@ def main():
     print(f"\n📚 Researching: {query}")
     print("This may take 30-60 seconds...\n")
     
+    streamed = []
+    
+    def print_token(text: str):
+        # Print the report header as soon as the first token arrives
+        if not streamed:
+            print("\n" + "=" * 60)
+            print("RESEARCH REPORT")
+            print("=" * 60 + "\n")
+        streamed.append(text)
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    
+    profiler = None
+    if args.profile:
+        from src.profiling import Profiler
+        profiler = Profiler(
+            output_dir=args.profile_dir,
+            interval=args.profile_interval,
+            slow_callback=args.slow_callback,
+            memory_top=args.trace_malloc
+        )
+    
     # Run research
     try:
-        final_state = asyncio.run(run_research(query))
-        
-        # Display results
-        print("\n" + "=" * 60)
-        print("RESEARCH REPORT")
-        print("=" * 60 + "\n")
+        if profiler is None:
+            final_state = asyncio.run(run_research_once(query, on_token=print_token))
+        else:
+            with profiler:
+                final_state = asyncio.run(profiler.run(run_research_once(query, on_token=print_token)))
         
-        report = final_state.get('synthesized_report', 'No report generated')
-        print(report)
+        # Display results (the report was streamed unless it came from the cache)
+        if streamed:
+            print()
+        else:
+            print("\n" + "=" * 60)
+            print("RESEARCH REPORT")
+            print("=" * 60 + "\n")
+            
+            report = final_state.get('synthesized_report', 'No report generated')
+            print(report)
         
         print("\n" + "=" * 60)
         print("SOURCES")
@@ -81,6 +157,19 @@ def main():
         for citation in final_state.get('citations', []):
             print(f"  {citation}")
         
+        trace = final_state.get('trace')
+        if trace:
+            print("\n" + "=" * 60)
+            print("RUN SUMMARY")
+            print("=" * 60 + "\n")
+            print(format_summary(trace["summary"]))
+        
+        if profiler is not None:
+            print("\n" + "=" * 60)
+            print("PROFILE")
+            print("=" * 60 + "\n")
+            print(profiler.summary())
+        
         print(f"\n📄 Full report saved to: {final_state.get('output_path')}")
         
     except KeyboardInterrupt:
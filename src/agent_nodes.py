@@ -1,9 +1,37 @@
 """Agent nodes for the LangGraph workflow."""
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, List, Tuple
 from src.state import ResearchState, Source
-from src.llm import get_llm, create_prompt
+from src.llm import get_llm, create_prompt, message_text
 from src.mcp_tools import web_search, web_fetch, filesystem
-from src.config import MAX_SEARCH_RESULTS, MAX_SOURCES_TO_FETCH, DEBUG
+from src.context import pack_context, render_context
+from src.dedup import dedupe_sources, group_duplicates
+from src.selection import select_sources
+from src.corpus import corpus
+from src import metrics
+from src.config import (
+    MAX_SEARCH_RESULTS,
+    MAX_SOURCES_TO_FETCH,
+    SOURCE_SELECTION,
+    SEARCH_CONCURRENCY,
+    FETCH_SKIP_MIN_CHARS,
+    SPECULATIVE_FETCH,
+    CORPUS_SKIP_MIN_RESULTS,
+    CORPUS_SCORE_WEIGHT,
+    SYNTHESIS_MODE,
+    SYNTHESIS_CONTEXT_TOKENS,
+    LLM_CACHE_NODES,
+    DEBUG
+)
+
+# Tag on the synthesis LLM call whose tokens are streamed to the UI/CLI
+REPORT_STREAM_TAG = "report_stream"
+
+# Placeholder the stitch call leaves for the per-subtopic sections
+FINDINGS_MARKER = "[[DETAILED_FINDINGS]]"
+
+# Fetches the speculative search spends from the run's budget (its top result)
+SPECULATIVE_FETCH_COUNT = min(1, MAX_SOURCES_TO_FETCH) if SPECULATIVE_FETCH else 0
 
 
 async def planning_node(state: ResearchState) -> Dict[str, Any]:
@@ -13,7 +41,7 @@ async def planning_node(state: ResearchState) -> Dict[str, Any]:
     if DEBUG:
         print(f"\n[PLANNING] Analyzing query: '{state.query}'")
     
-    llm = get_llm(temperature=0.3)
+    llm = get_llm(temperature=0.3, cache="planning" in LLM_CACHE_NODES)
     
     planning_prompt = create_prompt(
         """You are a research planning assistant. Given a research query, break it down into 3-5 specific subtopics that should be investigated.
@@ -73,6 +101,55 @@ SEARCH STRATEGY:
     }
 
 
+def merge_sources(sources: List[Source]) -> List[Source]:
+    """
+    Sort sources by relevance and drop duplicates (keeping the best-scored copy).
+    
+    URL variants (tracking parameters, www/AMP mirrors, ...) and near-identical
+    content such as syndicated copies count as duplicates.
+    """
+    return dedupe_sources(sources)
+
+
+def report_sources(state: ResearchState) -> List[Source]:
+    """Sources the report is built from: the ones whose content was fetched."""
+    fetched_urls = {item["url"] for item in state.fetched_content}
+    selected = [source for source in state.sources if source.url in fetched_urls]
+    return selected or state.sources[:MAX_SOURCES_TO_FETCH]
+
+
+async def search_sources(query: str, max_results: int) -> List[Source]:
+    """
+    Search the local corpus, then the web unless the corpus alone has at
+    least CORPUS_SKIP_MIN_RESULTS (and max_results) strong matches.
+    
+    Local match scores are rescaled onto the web results' scale, below the
+    best web score, so stored articles do not crowd out fresh results.
+    """
+    skip_at = max(max_results, CORPUS_SKIP_MIN_RESULTS)
+    local = await asyncio.to_thread(corpus.search, query, skip_at) if corpus else []
+    if len(local) >= skip_at:
+        if DEBUG:
+            print(f"  [CORPUS] {len(local)} local matches for: {query}")
+        # Counted as a search answered from a cache, so it shows in the hit ratio
+        metrics.cache_lookup("search", hit=True)
+        web = []
+    else:
+        web = await web_search.search(query, max_results=max_results)
+    
+    ceiling = CORPUS_SCORE_WEIGHT * max((source.relevance_score for source in web), default=1.0)
+    for source in local:
+        source.relevance_score = round(source.relevance_score * ceiling, 4)
+    return local[:max_results] + web
+
+
+def add_to_corpus(sources: List[Source]):
+    """Store fetched articles in the local corpus (placeholders are skipped)."""
+    for source in sources:
+        if source.content and not web_fetch.is_placeholder(source.url, source.content):
+            corpus.add(source.url, source.title, source.content)
+
+
 async def search_node(state: ResearchState) -> Dict[str, Any]:
     """
     Search phase: Execute searches for each subtopic and collect sources.
@@ -81,27 +158,37 @@ async def search_node(state: ResearchState) -> Dict[str, Any]:
         print(f"\n[SEARCHING] Executing searches for {len(state.subtopics)} subtopics")
     
     all_sources = []
-    search_queries = []
+    errors = []
     
     # Generate search queries from subtopics
-    for subtopic in state.subtopics:
-        query = f"{state.query} {subtopic}"
-        search_queries.append(query)
-        
-        if DEBUG:
-            print(f"  Searching: {query}")
-        
-        # Execute search
-        sources = await web_search.search(query, max_results=MAX_SEARCH_RESULTS // len(state.subtopics))
-        all_sources.extend(sources)
+    search_queries = [f"{state.query} {subtopic}" for subtopic in state.subtopics]
+    max_results = MAX_SEARCH_RESULTS // max(len(search_queries), 1)
+    semaphore = asyncio.Semaphore(max(1, SEARCH_CONCURRENCY))
     
-    # Sort by relevance and deduplicate
-    seen_urls = set()
-    unique_sources = []
-    for source in sorted(all_sources, key=lambda x: x.relevance_score, reverse=True):
-        if source.url not in seen_urls:
-            seen_urls.add(source.url)
-            unique_sources.append(source)
+    async def run_search(query: str) -> List[Source]:
+        async with semaphore:
+            if DEBUG:
+                print(f"  Searching: {query}")
+            return await search_sources(query, max_results)
+    
+    # Execute searches concurrently; one failing subtopic must not sink the rest
+    results = await asyncio.gather(
+        *(run_search(query) for query in search_queries),
+        return_exceptions=True
+    )
+    
+    for subtopic, query, result in zip(state.subtopics, search_queries, results):
+        if isinstance(result, Exception):
+            errors.append(f"Search failed for '{query}': {type(result).__name__}: {result}")
+            if DEBUG:
+                print(f"  [SEARCH ERROR] {query}: {result}")
+            continue
+        for source in result:
+            source.subtopic = subtopic
+        all_sources.extend(result)
+    
+    # Results of a speculative raw-query search join the pool here
+    unique_sources = merge_sources(all_sources + state.branch_sources)
     
     if DEBUG:
         print(f"[SEARCHING] Found {len(unique_sources)} unique sources")
@@ -109,32 +196,72 @@ async def search_node(state: ResearchState) -> Dict[str, Any]:
     return {
         "search_queries": search_queries,
         "sources": unique_sources,
+        "errors": errors,
         "current_step": "search_complete"
     }
 
 
-async def fetch_node(state: ResearchState) -> Dict[str, Any]:
+def plan_fetch(source: Source) -> str:
     """
-    Fetch phase: Get full content from top sources.
+    Decide how to obtain a source's content.
+    
+    Returns "skip" when the search payload already has enough content,
+    "cache" when the page cache can answer without network I/O, and
+    "fetch" otherwise.
     """
-    if DEBUG:
-        print(f"\n[FETCHING] Reading top {MAX_SOURCES_TO_FETCH} sources")
+    if len(source.content or "") >= FETCH_SKIP_MIN_CHARS:
+        return "skip"
+    if web_fetch.is_cached(source.url):
+        return "cache"
+    return "fetch"
+
+
+async def fetch_sources(sources: List[Source]) -> List[Dict]:
+    """Fill in content for the given sources according to their fetch plan."""
+    # plan_fetch reads the page cache (SQLite), so planning runs off the event loop
+    plans = await asyncio.to_thread(lambda: [plan_fetch(source) for source in sources])
+    to_fetch = [source for source, plan in zip(sources, plans) if plan != "skip"]
     
-    fetched_content = []
+    if DEBUG:
+        for i, (source, plan) in enumerate(zip(sources, plans), 1):
+            print(f"  {i}. [{plan}] {source.title}")
     
-    # Fetch top sources
-    for i, source in enumerate(state.sources[:MAX_SOURCES_TO_FETCH]):
-        if DEBUG:
-            print(f"  {i+1}. {source.title}")
-        
-        content = await web_fetch.fetch(source.url)
+    # Fetch (or read from cache) in parallel over the shared connection pool
+    contents = await web_fetch.fetch_many([source.url for source in to_fetch])
+    failed = set()
+    for source, content in zip(to_fetch, contents):
+        # A failed fetch yields placeholder text; keep the search snippet if there is one
+        if web_fetch.is_placeholder(source.url, content):
+            failed.add(id(source))
+            if source.content:
+                continue
         source.content = content
-        
-        fetched_content.append({
+    
+    # Grow the local corpus so later runs can skip search and fetch
+    fetched = [source for source in to_fetch if id(source) not in failed]
+    if corpus and fetched:
+        await asyncio.to_thread(add_to_corpus, fetched)
+    
+    return [
+        {
             "url": source.url,
             "title": source.title,
-            "content": content
-        })
+            "content": source.content,
+            "fetch_plan": "fetch_failed" if id(source) in failed else plan
+        }
+        for source, plan in zip(sources, plans)
+    ]
+
+
+async def fetch_node(state: ResearchState) -> Dict[str, Any]:
+    """
+    Fetch phase: Get full content from the selected sources.
+    """
+    if DEBUG:
+        print(f"\n[FETCHING] Reading {MAX_SOURCES_TO_FETCH} sources ({SOURCE_SELECTION} selection)")
+    
+    selected = select_sources(state.sources, MAX_SOURCES_TO_FETCH, state.query, state.subtopics)
+    fetched_content = await fetch_sources(selected)
     
     return {
         "fetched_content": fetched_content,
@@ -143,24 +270,144 @@ async def fetch_node(state: ResearchState) -> Dict[str, Any]:
     }
 
 
-async def synthesis_node(state: ResearchState) -> Dict[str, Any]:
+async def speculative_search_node(state: ResearchState) -> Dict[str, Any]:
     """
-    Synthesis phase: Generate comprehensive report with citations.
+    Search the original query while planning is still running, so its results
+    are ready when the subtopic searches land.
     """
     if DEBUG:
-        print(f"\n[SYNTHESIZING] Generating research report")
+        print(f"  Speculative search: {state.query}")
     
-    llm = get_llm(temperature=0.7)
+    try:
+        sources = await search_sources(state.query, MAX_SEARCH_RESULTS // 2)
+    except Exception as e:
+        return {
+            "search_queries": [state.query],
+            "errors": [f"Speculative search failed for '{state.query}': {type(e).__name__}: {e}"]
+        }
     
-    # Prepare source summaries for context
-    source_context = ""
-    for i, source in enumerate(state.sources[:MAX_SOURCES_TO_FETCH], 1):
-        source_context += f"\n[Source {i}] {source.title}\nURL: {source.url}\n"
-        if source.content:
-            source_context += f"Content: {source.content[:500]}...\n"
-        else:
-            source_context += f"Snippet: {source.snippet}\n"
-        source_context += "\n"
+    ranked = merge_sources(sources)
+    fetched = await fetch_sources(ranked[:SPECULATIVE_FETCH_COUNT]) if SPECULATIVE_FETCH_COUNT else []
+    
+    return {
+        "search_queries": [state.query],
+        "branch_sources": ranked,
+        "branch_fetched": fetched
+    }
+
+
+async def subtopic_research_node(state: ResearchState) -> Dict[str, Any]:
+    """
+    Fan-out branch: search one subtopic and fetch its best results right away,
+    without waiting for the other subtopics' searches.
+    """
+    subtopic = state.subtopic or ""
+    query = f"{state.query} {subtopic}".strip()
+    branch_count = max(len(state.subtopics), 1)
+    
+    if DEBUG:
+        print(f"  Searching: {query}")
+    
+    try:
+        sources = await search_sources(query, MAX_SEARCH_RESULTS // branch_count)
+    except Exception as e:
+        if DEBUG:
+            print(f"  [SEARCH ERROR] {query}: {e}")
+        return {
+            "search_queries": [query],
+            "errors": [f"Search failed for '{query}': {type(e).__name__}: {e}"]
+        }
+    
+    for source in sources:
+        source.subtopic = state.subtopic
+    
+    # Branches split what the speculative search left of the fetch budget; the
+    # first ones take the remainder, so with more subtopics than that the later
+    # ones fetch nothing and the merge step tops up from their results
+    branch = state.subtopics.index(subtopic) if subtopic in state.subtopics else 0
+    budget = max(0, MAX_SOURCES_TO_FETCH - state.prefetched)
+    fetch_count = budget // branch_count + (branch < budget % branch_count)
+    ranked = merge_sources(sources)
+    selected = select_sources(ranked, fetch_count, state.query, [subtopic]) if fetch_count else []
+    fetched = await fetch_sources(selected)
+    
+    return {
+        "search_queries": [query],
+        "branch_sources": ranked,
+        "branch_fetched": fetched
+    }
+
+
+async def merge_node(state: ResearchState) -> Dict[str, Any]:
+    """
+    Fan-in: merge and deduplicate the branches' sources before synthesis.
+    """
+    fetched_by_url = {}
+    for item in state.branch_fetched:
+        fetched_by_url.setdefault(item["url"], item)
+    
+    # Branches may have fetched different copies of the same page; the group's
+    # most relevant source keeps the fetched content
+    unique_sources = []
+    fetched = {}
+    for source, duplicates in group_duplicates(state.branch_sources):
+        item = next(
+            (fetched_by_url[s.url] for s in [source, *duplicates] if s.url in fetched_by_url),
+            None
+        )
+        if item is not None:
+            source.content = item["content"]
+            fetched[source.url] = {**item, "url": source.url, "title": source.title}
+        unique_sources.append(source)
+    
+    # Branches may have picked the same pages; top up to the fetch budget
+    missing = MAX_SOURCES_TO_FETCH - len(fetched)
+    if missing > 0:
+        extra = select_sources(
+            [source for source in unique_sources if source.url not in fetched],
+            missing,
+            state.query,
+            state.subtopics,
+            selected=[source for source in unique_sources if source.url in fetched]
+        )
+        for item in await fetch_sources(extra):
+            fetched[item["url"]] = item
+    
+    # Fetched sources lead so the report cites what was actually read
+    sources = (
+        [source for source in unique_sources if source.url in fetched]
+        + [source for source in unique_sources if source.url not in fetched]
+    )
+    
+    if DEBUG:
+        print(f"\n[MERGING] {len(sources)} unique sources, {len(fetched)} fetched")
+    
+    return {
+        "sources": sources,
+        "fetched_content": list(fetched.values()),
+        "current_step": "fetch_complete"
+    }
+
+
+def synthesis_candidates(state: ResearchState) -> List[Source]:
+    """Fetched sources first, then the remaining search results."""
+    sources = report_sources(state)
+    sources += [source for source in state.sources if source not in sources]
+    return sources[:MAX_SEARCH_RESULTS]
+
+
+async def synthesize_report(
+    state: ResearchState,
+    llm,
+    sources: List[Source]
+) -> Tuple[str, List[Tuple[int, Source]]]:
+    """
+    Generate the whole report with a single (streamed) LLM call.
+    
+    Only sources with packed content are numbered (and later cited).
+    """
+    packed = pack_context(sources, [state.query, *state.subtopics], SYNTHESIS_CONTEXT_TOKENS)
+    numbered = [(n, sources[i], chunks) for n, (i, chunks) in enumerate(packed, 1)]
     
     synthesis_prompt = create_prompt(
         """You are a research analyst. Create a comprehensive research report based on the following information.
@@ -182,16 +429,140 @@ Generate a well-structured research report with:
 Use [Source X] notation to cite sources throughout the report. Be factual and analytical.""",
         query=state.query,
         subtopics="\n".join(f"- {t}" for t in state.subtopics),
-        sources=source_context
+        sources=render_context(numbered)
+    )
+    
+    # Stream the call so stream_mode="messages" consumers can render the report
+    # progressively; the joined chunks equal the ainvoke() result
+    response = None
+    async for chunk in llm.astream(synthesis_prompt, config={"tags": [REPORT_STREAM_TAG]}):
+        response = chunk if response is None else response + chunk
+    report = message_text(response.content) if response is not None else ""
+    return report, [(n, source) for n, source, _ in numbered]
+
+
+async def synthesize_sections(
+    state: ResearchState,
+    llm,
+    sources: List[Source]
+) -> Tuple[str, List[Tuple[int, Source]], List[str]]:
+    """
+    Generate each subtopic's findings with a concurrent LLM call, then write the
+    executive summary, insights and conclusion in a short stitch call.
+    
+    Source numbers are assigned once, so [Source X] is consistent across sections;
+    each section gets its own context budget. Only the stitch call is streamed
+    under REPORT_STREAM_TAG (concurrent sections would interleave), so stream
+    consumers see the findings marker where the sections go.
+    """
+    numbered = list(enumerate(sources, 1))
+    used = set()
+    errors = []
+    
+    async def write_section(subtopic: str) -> str:
+        # Sources found for this subtopic, or everything if none were tagged
+        relevant = [(i, source) for i, source in numbered if source.subtopic == subtopic] or numbered
+        packed = pack_context(
+            [source for _, source in relevant],
+            [state.query, subtopic],
+            SYNTHESIS_CONTEXT_TOKENS
+        )
+        section_sources = [(relevant[j][0], relevant[j][1], chunks) for j, chunks in packed]
+        used.update(n for n, _, _ in section_sources)
+        
+        section_prompt = create_prompt(
+            """You are a research analyst writing one section of a research report.
+
+Original Query: {query}
+Section Subtopic: {subtopic}
+
+Available Sources:
+{sources}
+
+Write the detailed findings for this subtopic as a markdown section that starts with the heading "### {subtopic}". Cite sources using the [Source X] numbers given above exactly as numbered. Be factual and analytical. Do not write an introduction or conclusion for the whole report.""",
+            query=state.query,
+            subtopic=subtopic,
+            sources=render_context(section_sources)
+        )
+        response = await llm.ainvoke(section_prompt)
+        return message_text(response.content).strip()
+    
+    results = await asyncio.gather(
+        *(write_section(subtopic) for subtopic in state.subtopics),
+        return_exceptions=True
     )
     
-    response = await llm.ainvoke(synthesis_prompt)
-    synthesized_report = response.content
+    sections = []
+    for subtopic, result in zip(state.subtopics, results):
+        if isinstance(result, Exception):
+            errors.append(f"Section synthesis failed for '{subtopic}': {type(result).__name__}: {result}")
+            sections.append(f"### {subtopic}\n\n_This section could not be generated._")
+        else:
+            sections.append(result)
+    findings = "\n\n".join(sections)
+    
+    stitch_prompt = create_prompt(
+        """You are a research analyst finishing a research report. The detailed findings below were written separately for each subtopic.
+
+Original Query: {query}
+
+Detailed Findings:
+{findings}
+
+Write the remaining parts of the report in markdown using exactly this layout:
+## Executive Summary
+[summary of the key findings]
+{marker}
+## Key Insights
+[insights that cut across subtopics]
+## Conclusion
+[conclusion]
+
+Keep the [Source X] citations consistent with the findings. Output the line {marker} exactly as shown; it is replaced by the detailed findings.""",
+        query=state.query,
+        findings=findings,
+        marker=FINDINGS_MARKER
+    )
+    # The stitch call is streamed like the single-call report, so
+    # stream_mode="messages" consumers see the report frame being written
+    response = None
+    async for chunk in llm.astream(stitch_prompt, config={"tags": [REPORT_STREAM_TAG]}):
+        response = chunk if response is None else response + chunk
+    frame = message_text(response.content).strip() if response is not None else ""
+    
+    findings_block = f"## Detailed Findings\n\n{findings}"
+    if FINDINGS_MARKER in frame:
+        head, tail = frame.split(FINDINGS_MARKER, 1)
+        report = f"{head.rstrip()}\n\n{findings_block}\n\n{tail.lstrip()}"
+    else:
+        report = f"{frame}\n\n{findings_block}"
+    
+    return report.strip(), [(n, source) for n, source in numbered if n in used], errors
+
+
+async def synthesis_node(state: ResearchState) -> Dict[str, Any]:
+    """
+    Synthesis phase: Generate comprehensive report with citations.
+    """
+    if DEBUG:
+        print(f"\n[SYNTHESIZING] Generating research report ({SYNTHESIS_MODE} mode)")
+    
+    # Cached reports are only reused for byte-identical synthesis prompts
+    llm = get_llm(temperature=0.7, cache="synthesis" in LLM_CACHE_NODES)
+    errors = []
+    
+    # The context packer picks the most relevant chunks of every found source
+    # (fetched pages first) within the token budget
+    sources = synthesis_candidates(state)
+    if SYNTHESIS_MODE == "sections" and state.subtopics:
+        synthesized_report, cited, errors = await synthesize_sections(state, llm, sources)
+    else:
+        synthesized_report, cited = await synthesize_report(state, llm, sources)
     
     # Generate citations
     citations = [
         f"[{i}] {source.title} - {source.url}"
-        for i, source in enumerate(state.sources[:MAX_SOURCES_TO_FETCH], 1)
+        for i, source in cited
     ]
     
     if DEBUG:
@@ -200,6 +571,7 @@ Use [Source X] notation to cite sources throughout the report. Be factual and an
     return {
         "synthesized_report": synthesized_report,
         "citations": citations,
+        "errors": errors,
         "current_step": "synthesis_complete"
     }
 
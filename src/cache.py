@@ -0,0 +1,169 @@
+"""Persistent SQLite-backed caches with TTL and LRU eviction."""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+from src.config import DEBUG
+
+
+class CacheEntry(NamedTuple):
+    """A cached value together with its freshness information."""
+    value: Any
+    created_at: float
+    expires_at: float
+    
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class SQLiteCache:
+    """
+    Key/value store in a SQLite database (WAL mode).
+    
+    Values are stored as JSON. Entries past their TTL are treated as misses
+    (unless explicitly asked for), and the least recently used entries are
+    evicted once max_entries is exceeded. Cache errors never propagate -
+    a broken cache behaves like an empty one.
+    """
+    
+    def __init__(self, path: Path, ttl: float, max_entries: int):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+    
+    def get_entry(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """Return the entry for key, or None on a miss."""
+        now = time.time()
+        
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, created_at, expires_at FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and (allow_stale or now < row[2]):
+                    self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            if DEBUG:
+                print(f"[Cache Error] {self.path.name}: {e}")
+            row = None
+        
+        if row is None or (not allow_stale and now >= row[2]):
+            self.misses += 1
+            return None
+        
+        entry = CacheEntry(json.loads(row[0]), row[1], row[2])
+        
+        # A stale entry still needs network I/O, so it does not count as a hit
+        if entry.fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+    
+    def contains(self, key: str) -> bool:
+        """Whether a fresh entry exists (does not touch counters or LRU order)."""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return False
+        return row is not None and time.time() < row[0]
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the fresh value for key, or None."""
+        entry = self.get_entry(key)
+        return entry.value if entry is not None else None
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store value under key for ttl seconds (default: the cache TTL)."""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created_at, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(value), now, expires_at, now)
+                )
+                self._evict()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            if DEBUG:
+                print(f"[Cache Error] {self.path.name}: {e}")
+    
+    def refresh(self, key: str, ttl: Optional[float] = None):
+        """Extend the lifetime of an existing entry without rewriting it."""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE cache SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                    (expires_at, now, key)
+                )
+        except sqlite3.Error as e:
+            if DEBUG:
+                print(f"[Cache Error] {self.path.name}: {e}")
+    
+    def delete(self, key: str):
+        """Remove an entry if present."""
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            if DEBUG:
+                print(f"[Cache Error] {self.path.name}: {e}")
+    
+    def _evict(self):
+        """Drop least recently used entries beyond max_entries (lock held)."""
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,)
+            )
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the current entry count."""
+        try:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        except sqlite3.Error:
+            entries = 0
+        
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+    
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,139 @@
+"""Record/replay of search, fetch and LLM exchanges (CASSETTE_MODE)."""
+import asyncio
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from src import tracing
+from src.config import CASSETTE_MODE, CASSETTE_PATH, CASSETTE_LATENCY_SCALE, DEBUG
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recorded exchange for a request."""
+
+
+class Cassette:
+    """
+    Recorded search, fetch and LLM exchanges in a gzipped JSON Lines file.
+    
+    Each line holds one exchange: its kind ("search", "fetch", "llm"), the
+    request key, the response value and how long the call took (streamed LLM
+    calls also keep their chunks with time offsets). Recording appends each
+    exchange to the file as its own gzip member as soon as it completes, so
+    nothing is held in memory or lost when the process is killed.
+    
+    On replay, a key that was recorded several times is answered with its
+    recordings in order, the last one repeating. Responses are served
+    instantly, or after the recorded time multiplied by latency_scale.
+    """
+    
+    def __init__(self, path: Path, mode: str = "off", latency_scale: float = 0.0):
+        self.path = Path(path)
+        self.mode = mode if mode in ("record", "replay") else "off"
+        self.latency_scale = latency_scale
+        self._replay: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        self._positions: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+        
+        if self.mode == "replay":
+            records = self._load()
+            for record in records:
+                self._replay[(record["kind"], record["key"])].append(record)
+            if DEBUG:
+                print(f"[CASSETTE] replay mode, {len(records)} exchanges in {self.path}")
+        elif self.mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if DEBUG:
+                print(f"[CASSETTE] record mode, appending to {self.path}")
+    
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+    
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+    
+    def _load(self) -> List[Dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        records = []
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        records.append(json.loads(line))
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+            # A process killed mid-write leaves a truncated last exchange
+            if DEBUG:
+                print(f"[CASSETTE] Ignoring damaged tail of {self.path}: {e}")
+        return records
+    
+    def record(self, kind: str, key: str, value: Any, elapsed: float, **extra: Any):
+        """Append one exchange to the cassette file."""
+        record = {"kind": kind, "key": key, "elapsed": round(elapsed, 4), "value": value, **extra}
+        data = gzip.compress((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+        try:
+            with self._lock, open(self.path, "ab") as f:
+                f.write(data)
+        except OSError as e:
+            if DEBUG:
+                print(f"[CASSETTE] Could not record {kind} exchange: {e}")
+    
+    def lookup(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """Next recorded exchange for (kind, key), or None."""
+        with self._lock:
+            recordings = self._replay.get((kind, key))
+            if not recordings:
+                return None
+            position = self._positions[(kind, key)]
+            self._positions[(kind, key)] = position + 1
+            return recordings[min(position, len(recordings) - 1)]
+    
+    async def delay(self, seconds: float):
+        """Wait out (scaled) recorded latency."""
+        if self.latency_scale > 0 and seconds > 0:
+            await asyncio.sleep(seconds * self.latency_scale)
+    
+    async def through(
+        self,
+        kind: str,
+        key: str,
+        run: Callable[[], Awaitable[Any]],
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+        miss: Optional[Callable[[], Any]] = None
+    ) -> Any:
+        """
+        Run a call through the cassette.
+        
+        Off: just run it. Record: run it and store the encoded result with
+        its duration. Replay: return the decoded recording without running
+        the call; on a miss return miss() or raise CassetteMiss.
+        """
+        if self.mode == "record":
+            start = time.perf_counter()
+            value = await run()
+            self.record(kind, key, encode(value), time.perf_counter() - start)
+            return value
+        
+        if self.mode == "replay":
+            entry = self.lookup(kind, key)
+            if entry is None:
+                if DEBUG:
+                    print(f"[CASSETTE] No recording for {kind} {key[:80]}")
+                if miss is None:
+                    raise CassetteMiss(f"No recorded {kind} exchange for {key[:80]}")
+                tracing.current_span().set(fallback="no recording")
+                return miss()
+            await self.delay(entry["elapsed"])
+            return decode(entry["value"])
+        
+        return await run()
+
+
+# Singleton instance
+cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY_SCALE)
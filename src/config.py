@@ -20,12 +20,17 @@ except:
 PROJECT_ROOT = Path(__file__).parent.parent
 REPORTS_DIR = PROJECT_ROOT / "reports"
 REPORTS_DIR.mkdir(exist_ok=True)
+CACHE_DIR = Path(os.getenv("CACHE_DIR", REPORTS_DIR.parent / ".cache"))
 
 # LLM Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# Alternative API endpoints (e.g. a gateway, or local stand-ins for load tests)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+TAVILY_API_BASE_URL = os.getenv("TAVILY_API_BASE_URL") or None
+
 # Default LLM provider (openai, anthropic, or google)
 if OPENAI_API_KEY:
     LLM_PROVIDER = "openai"
@@ -40,7 +45,109 @@ else:
     LLM_PROVIDER = "openai"
     MODEL_NAME = "gpt-4-turbo-preview"
 
+# LLM response cache (nodes listed in LLM_CACHE_NODES reuse answers for
+# byte-identical prompts; TTL in seconds)
+LLM_CACHE_NODES = {n.strip() for n in os.getenv("LLM_CACHE_NODES", "planning").split(",") if n.strip()}
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "604800"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+
+# Record/replay cassette: "record" saves every search, fetch and LLM exchange
+# (with timings) to CASSETTE_PATH, "replay" serves them back without network
+# access; replayed calls wait CASSETTE_LATENCY_SCALE times the recorded time
+# (0 answers instantly)
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()
+CASSETTE_PATH = Path(os.getenv("CASSETTE_PATH", CACHE_DIR / "cassette.jsonl.gz"))
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "0"))
+
+# Per-run tracing of nodes and external calls (attached to the final state);
+# with TRACE_EXPORT_DIR set each run is also written there as OTLP JSON
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORT_DIR = os.getenv("TRACE_EXPORT_DIR") or None
+
+# Process-wide metrics (latency histograms, call/failure counters, cache hit
+# ratios, in-flight gauges, event-loop lag); METRICS_PORT > 0 serves them in
+# Prometheus text format at http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
 # Agent settings
 MAX_SEARCH_RESULTS = 10
 MAX_SOURCES_TO_FETCH = 3
+# How sources to fetch are chosen: "mmr" spreads the fetch budget across
+# subtopics (MMR_LAMBDA trades relevance against diversity), "relevance"
+# takes the top search scores
+SOURCE_SELECTION = os.getenv("SOURCE_SELECTION", "mmr")
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+# Run each subtopic as its own search→fetch branch instead of a search stage
+# followed by a fetch stage
+PIPELINE_SUBTOPICS = os.getenv("PIPELINE_SUBTOPICS", "true").lower() == "true"
+# Search (and optionally fetch the best hit for) the raw query while planning runs
+SPECULATIVE_SEARCH = os.getenv("SPECULATIVE_SEARCH", "false").lower() == "true"
+SPECULATIVE_FETCH = os.getenv("SPECULATIVE_FETCH", "false").lower() == "true"
+# "single" writes the report in one LLM call; "sections" writes each subtopic
+# concurrently and stitches them with a short final call
+SYNTHESIS_MODE = os.getenv("SYNTHESIS_MODE", "single")
+# Prompt tokens of source material per synthesis call; the most relevant
+# chunks of every source are packed until the budget is used up
+CONTEXT_TOKEN_BUDGETS = {
+    "gpt-4-turbo-preview": 6000,
+    "claude-3-sonnet-20240229": 6000,
+    "gemini-2.5-flash-lite": 8000,
+}
+SYNTHESIS_CONTEXT_TOKENS = int(os.getenv("SYNTHESIS_CONTEXT_TOKENS", CONTEXT_TOKEN_BUDGETS.get(MODEL_NAME, 4000)))
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "5"))
+
+# Sources whose content (or snippet) SimHash fingerprints differ in at most
+# this many of 64 bits are treated as copies of each other (-1 disables)
+DEDUP_SIMHASH_DISTANCE = int(os.getenv("DEDUP_SIMHASH_DISTANCE", "6"))
+
+# Ask Tavily for the page's raw content so sources can skip the fetch stage
+SEARCH_INCLUDE_RAW_CONTENT = os.getenv("SEARCH_INCLUDE_RAW_CONTENT", "false").lower() == "true"
+
+# Search cache (TTL in seconds, 0 disables the cache)
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "86400"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+
+# Local corpus of fetched articles, searched before the web. A match is
+# served when it contains CORPUS_MIN_COVERAGE of the query terms (and, with
+# CORPUS_VECTORS, has CORPUS_MIN_SIMILARITY cosine similarity); the web is
+# skipped for a query once CORPUS_SKIP_MIN_RESULTS matches are found. Local
+# scores are rescaled to at most CORPUS_SCORE_WEIGHT times the best web score
+CORPUS_ENABLED = os.getenv("CORPUS_ENABLED", "false").lower() == "true"
+CORPUS_MAX_AGE = float(os.getenv("CORPUS_MAX_AGE", "2592000"))
+CORPUS_MAX_DOCUMENTS = int(os.getenv("CORPUS_MAX_DOCUMENTS", "20000"))
+CORPUS_MIN_CHARS = int(os.getenv("CORPUS_MIN_CHARS", "500"))
+CORPUS_MIN_COVERAGE = float(os.getenv("CORPUS_MIN_COVERAGE", "0.8"))
+CORPUS_VECTORS = os.getenv("CORPUS_VECTORS", "false").lower() == "true"
+CORPUS_MIN_SIMILARITY = float(os.getenv("CORPUS_MIN_SIMILARITY", "0.2"))
+CORPUS_SKIP_MIN_RESULTS = int(os.getenv("CORPUS_SKIP_MIN_RESULTS", "5"))
+CORPUS_SCORE_WEIGHT = float(os.getenv("CORPUS_SCORE_WEIGHT", "0.8"))
+
+# Fetch settings
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "20"))
+FETCH_MAX_CONNECTIONS_PER_HOST = int(os.getenv("FETCH_MAX_CONNECTIONS_PER_HOST", "4"))
+FETCH_HTTP2 = os.getenv("FETCH_HTTP2", "false").lower() == "true"
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", "1000000"))
+
+# Sources whose search payload already has this much content are not fetched
+FETCH_SKIP_MIN_CHARS = int(os.getenv("FETCH_SKIP_MIN_CHARS", "1500"))
+
+# Page cache (the default TTL applies when a response has no caching headers)
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+PAGE_CACHE_DEFAULT_TTL = float(os.getenv("PAGE_CACHE_DEFAULT_TTL", "3600"))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "2000"))
+
+# Content extraction settings (pages at or above the threshold are parsed in
+# the process pool, smaller ones in the thread pool; 0 workers disables a pool)
+EXTRACT_BACKEND = os.getenv("EXTRACT_BACKEND", "lxml")  # lxml or html2text
+EXTRACT_MAX_CHARS = int(os.getenv("EXTRACT_MAX_CHARS", "3000"))
+EXTRACT_PROCESS_WORKERS = int(os.getenv("EXTRACT_PROCESS_WORKERS", "2"))
+EXTRACT_THREAD_WORKERS = int(os.getenv("EXTRACT_THREAD_WORKERS", "4"))
+EXTRACT_PROCESS_THRESHOLD = int(os.getenv("EXTRACT_PROCESS_THRESHOLD", "200000"))
+# Modules defining extra extractors (comma-separated dotted paths); they are
+# imported here and in every extraction worker so register_extractor() runs there too
+EXTRACT_PLUGINS = [m.strip() for m in os.getenv("EXTRACT_PLUGINS", "").split(",") if m.strip()]
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
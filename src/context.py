@@ -0,0 +1,160 @@
+"""Relevance-ranked, token-budgeted packing of source content for LLM prompts."""
+import re
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from src.state import Source
+
+# Target chunk size in characters (paragraphs are merged/split towards this)
+CHUNK_CHARS = 600
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Weight of the search provider's relevance score next to BM25
+RELEVANCE_WEIGHT = 0.5
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in is it its of on or that the this
+to was were what when where which who why will with about into than then there these
+those their them they we you your our can do does not no vs
+""".split())
+
+TOKEN_PATTERN = re.compile(r"\w+")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def chunk_text(text: str, target_chars: int = CHUNK_CHARS) -> List[str]:
+    """Split text into roughly target_chars chunks on paragraph/sentence boundaries."""
+    # (text, separator to use when joining it onto the previous piece)
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= target_chars:
+            pieces.append((paragraph, "\n"))
+        else:
+            sentences = [s.strip() for s in SENTENCE_END.split(paragraph) if s.strip()]
+            pieces.extend((sentence, " " if i else "\n") for i, sentence in enumerate(sentences))
+    
+    chunks = []
+    current = ""
+    for piece, separator in pieces:
+        if current and len(current) + len(piece) + 1 > target_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}{separator}{piece}" if current else piece
+        # A single over-long sentence is hard-split
+        while len(current) > target_chars * 2:
+            chunks.append(current[:target_chars])
+            current = current[target_chars:]
+    if current:
+        chunks.append(current)
+    
+    return chunks
+
+
+def bm25_scores(chunks: Sequence[str], queries: Sequence[str]) -> np.ndarray:
+    """BM25 score of every chunk against the combined query terms."""
+    terms = sorted({t for q in queries for t in tokenize(q)})
+    if not chunks or not terms:
+        return np.zeros(len(chunks))
+    
+    term_index = {t: i for i, t in enumerate(terms)}
+    tf = np.zeros((len(chunks), len(terms)))
+    lengths = np.zeros(len(chunks))
+    
+    for row, chunk in enumerate(chunks):
+        tokens = tokenize(chunk)
+        lengths[row] = len(tokens)
+        for token in tokens:
+            column = term_index.get(token)
+            if column is not None:
+                tf[row, column] += 1
+    
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log(1 + (len(chunks) - df + 0.5) / (df + 0.5))
+    avg_length = lengths.mean() or 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length)
+    
+    return (idf * tf * (BM25_K1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+
+def pack_context(
+    sources: Sequence[Source],
+    queries: Sequence[str],
+    budget_tokens: int
+) -> List[Tuple[int, List[str]]]:
+    """
+    Select the most relevant chunks of the sources within a token budget.
+    
+    Every source with relevant content first gets its best chunk (so coverage
+    is not lost to one long article), then the remaining budget goes to the
+    highest-scoring chunks that match the query.
+    
+    Returns (index into sources, chunks in document order) for every source
+    that made it in, in input order.
+    """
+    owners = []
+    chunks = []
+    for index, source in enumerate(sources):
+        for chunk in chunk_text(source.content or source.snippet or ""):
+            owners.append(index)
+            chunks.append(chunk)
+    
+    if not chunks:
+        return []
+    
+    owners_array = np.array(owners)
+    relevance = np.array([sources[i].relevance_score for i in owners])
+    bm25 = bm25_scores(chunks, queries)
+    scores = bm25 + RELEVANCE_WEIGHT * relevance
+    # Chunks sharing no term with the query (navigation, boilerplate) only get
+    # in through the coverage pass
+    useful = bm25 > 0 if bm25.any() else np.ones(len(chunks), dtype=bool)
+    costs = np.array([estimate_tokens(chunk) for chunk in chunks])
+    
+    selected = np.zeros(len(chunks), dtype=bool)
+    remaining = budget_tokens
+    
+    # Coverage pass: best chunk of each source
+    for index in range(len(sources)):
+        candidates = np.flatnonzero(owners_array == index)
+        if candidates.size == 0:
+            continue
+        best = candidates[np.argmax(scores[candidates])]
+        if costs[best] <= remaining:
+            selected[best] = True
+            remaining -= costs[best]
+    
+    # Fill pass: highest scores first
+    for position in np.argsort(-scores, kind="stable"):
+        if useful[position] and not selected[position] and costs[position] <= remaining:
+            selected[position] = True
+            remaining -= costs[position]
+    
+    packed: Dict[int, List[str]] = {}
+    for position in np.flatnonzero(selected):
+        packed.setdefault(owners[position], []).append(chunks[position])
+    
+    return sorted(packed.items())
+
+
+def render_context(numbered: Sequence[Tuple[int, Source, List[str]]]) -> str:
+    """Render packed chunks under their [Source X] headers."""
+    source_context = ""
+    for number, source, chunks in numbered:
+        source_context += f"\n[Source {number}] {source.title}\nURL: {source.url}\n"
+        source_context += "Content:\n" + "\n...\n".join(chunks) + "\n\n"
+    return source_context
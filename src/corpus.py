@@ -0,0 +1,199 @@
+"""Persistent local corpus of fetched articles, searched before the web."""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from src.state import Source
+from src.context import tokenize
+from src.selection import hashed_vectors
+from src.config import (
+    CACHE_DIR,
+    CORPUS_ENABLED,
+    CORPUS_MAX_AGE,
+    CORPUS_MAX_DOCUMENTS,
+    CORPUS_MIN_CHARS,
+    CORPUS_MIN_COVERAGE,
+    CORPUS_VECTORS,
+    CORPUS_MIN_SIMILARITY,
+    DEBUG
+)
+
+# Vectors are stored as float16 to keep the index compact
+VECTOR_DTYPE = np.float16
+
+# Characters of content shown as a local result's snippet
+SNIPPET_CHARS = 300
+
+# FTS candidates considered per requested result before filtering
+CANDIDATE_FACTOR = 4
+
+
+class LocalCorpus:
+    """
+    Article store with an FTS5 (BM25) index and an optional hashed-vector index.
+    
+    Articles are added as they are fetched. A search returns "strong" matches
+    only: documents containing at least CORPUS_MIN_COVERAGE of the query terms
+    (and, with vectors enabled, at least CORPUS_MIN_SIMILARITY cosine
+    similarity), newer than CORPUS_MAX_AGE. A match's relevance_score is its
+    term coverage (averaged with the similarity), which callers rescale
+    before mixing it with web results. Like the caches, corpus errors never
+    propagate.
+    """
+    
+    def __init__(self, path: Path, max_documents: int = CORPUS_MAX_DOCUMENTS, vectors: bool = CORPUS_VECTORS):
+        self.path = Path(path)
+        self.max_documents = max_documents
+        self.vectors = vectors
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                url TEXT UNIQUE NOT NULL,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                vector BLOB,
+                added_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+            "title, content, content='documents', content_rowid='id')"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_added ON documents (added_at)")
+    
+    def add(self, url: str, title: str, content: str):
+        """Add or replace an article (too-short content is ignored)."""
+        if len(content or "") < CORPUS_MIN_CHARS:
+            return
+        
+        vector = None
+        if self.vectors:
+            vector = hashed_vectors([f"{title}\n{content}"])[0].astype(VECTOR_DTYPE).tobytes()
+        
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    self._delete(url)
+                    cursor = self._conn.execute(
+                        "INSERT INTO documents (url, title, content, vector, added_at) VALUES (?, ?, ?, ?, ?)",
+                        (url, title, content, vector, time.time())
+                    )
+                    self._conn.execute(
+                        "INSERT INTO documents_fts (rowid, title, content) VALUES (?, ?, ?)",
+                        (cursor.lastrowid, title, content)
+                    )
+                    self._evict()
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            if DEBUG:
+                print(f"[Corpus Error] {e}")
+    
+    def _delete(self, url: str):
+        """Remove an article and its index entry (lock held)."""
+        row = self._conn.execute("SELECT id, title, content FROM documents WHERE url = ?", (url,)).fetchone()
+        if row is not None:
+            self._conn.execute(
+                "INSERT INTO documents_fts (documents_fts, rowid, title, content) VALUES ('delete', ?, ?, ?)",
+                row
+            )
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+    
+    def _evict(self):
+        """Drop the oldest articles beyond max_documents (lock held)."""
+        count = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        excess = count - self.max_documents
+        if excess > 0:
+            urls = self._conn.execute(
+                "SELECT url FROM documents ORDER BY added_at ASC LIMIT ?", (excess,)
+            ).fetchall()
+            for (url,) in urls:
+                self._delete(url)
+    
+    def search(self, query: str, limit: int) -> List[Source]:
+        """Strong local matches for query, best first."""
+        terms = sorted(set(tokenize(query)))
+        if not terms or limit <= 0:
+            return []
+        
+        match = " OR ".join(f'"{term}"' for term in terms)
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT d.url, d.title, d.content, d.vector FROM documents_fts "
+                    "JOIN documents d ON d.id = documents_fts.rowid "
+                    "WHERE documents_fts MATCH ? AND d.added_at >= ? "
+                    "ORDER BY bm25(documents_fts, 2.0, 1.0) LIMIT ?",
+                    (match, time.time() - CORPUS_MAX_AGE, limit * CANDIDATE_FACTOR)
+                ).fetchall()
+        except sqlite3.Error as e:
+            if DEBUG:
+                print(f"[Corpus Error] {e}")
+            return []
+        
+        query_vector = hashed_vectors([query])[0] if self.vectors else None
+        
+        matches = []
+        for url, title, content, vector in rows:
+            document_terms = set(tokenize(f"{title}\n{content}"))
+            score = sum(term in document_terms for term in terms) / len(terms)
+            if score < CORPUS_MIN_COVERAGE:
+                continue
+            
+            if query_vector is not None and vector is not None:
+                similarity = float(np.frombuffer(vector, dtype=VECTOR_DTYPE).astype(float) @ query_vector)
+                if similarity < CORPUS_MIN_SIMILARITY:
+                    continue
+                score = (score + similarity) / 2
+            
+            matches.append(Source(
+                url=url,
+                title=title,
+                snippet=content[:SNIPPET_CHARS],
+                content=content,
+                relevance_score=score
+            ))
+        
+        # Stable sort keeps BM25 order among equally covered documents
+        matches.sort(key=lambda x: x.relevance_score, reverse=True)
+        return matches[:limit]
+    
+    def count(self) -> int:
+        """Number of stored articles."""
+        try:
+            with self._lock:
+                return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+    
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def open_corpus() -> Optional[LocalCorpus]:
+    """The local corpus, or None when disabled or SQLite lacks FTS5."""
+    if not CORPUS_ENABLED:
+        return None
+    try:
+        return LocalCorpus(CACHE_DIR / "corpus.sqlite3")
+    except sqlite3.Error as e:
+        if DEBUG:
+            print(f"[Corpus Error] Local corpus unavailable: {e}")
+        return None
+
+
+# Global instance
+corpus = open_corpus()
@@ -0,0 +1,161 @@
+"""Duplicate source detection: URL canonicalisation and SimHash content fingerprints."""
+import hashlib
+import re
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import numpy as np
+from src.state import Source
+from src.context import tokenize
+from src.mcp_tools import web_fetch
+from src.config import DEDUP_SIMHASH_DISTANCE
+
+# Query parameters that only track the visit and never change the page
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "_ga", "_gl", "amp", "outputtype", "cmpid", "ncid", "sr_share",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+
+# Host prefixes that serve the same site (www, mobile and AMP mirrors)
+HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+
+AMP_CACHE_SUFFIX = ".cdn.ampproject.org"
+AMP_PATH = re.compile(r"(/amp)+/?$|^/amp(?=/)|\.amp(?=\.html?$)", re.IGNORECASE)
+
+# Texts shorter than this (in tokens) are too short for a meaningful fingerprint
+MIN_FINGERPRINT_TOKENS = 12
+SHINGLE_SIZE = 3
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalise a URL so variants of the same page compare equal.
+    
+    http/https, www/m/amp hosts, default ports, AMP paths, tracking
+    parameters, parameter order, fragments and trailing slashes are ignored.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    if not parts.netloc:
+        return url.strip()
+    
+    host = (parts.hostname or "").lower()
+    
+    # Google AMP cache: https://www-example-com.cdn.ampproject.org/c/s/www.example.com/page
+    if host.endswith(AMP_CACHE_SUFFIX):
+        match = re.match(r"^/[a-z](?:/s)?/(.+)$", parts.path)
+        if match:
+            return canonical_url("https://" + match.group(1))
+    
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix) and host.count(".") > 1:
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    
+    path = AMP_PATH.sub("", parts.path).rstrip("/") or "/"
+    
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over word shingles, or None if the text is too short."""
+    tokens = tokenize(text)
+    if len(tokens) < MIN_FINGERPRINT_TOKENS:
+        return None
+    
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles],
+        dtype=np.uint64
+    )
+    
+    # Every shingle votes +1/-1 on each bit; the fingerprint keeps the majority
+    bits = ((hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)).astype(np.int64)
+    votes = 2 * bits.sum(axis=0) - len(hashes)
+    return sum(1 << int(i) for i in np.flatnonzero(votes > 0))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints."""
+    return bin(a ^ b).count("1")
+
+
+def group_duplicates(
+    sources: List[Source],
+    max_distance: int = DEDUP_SIMHASH_DISTANCE
+) -> List[Tuple[Source, List[Source]]]:
+    """
+    Group sources that are the same page or near-identical copies.
+    
+    Sources are first grouped by canonical URL, then groups are merged when the
+    SimHash of their content (or of their snippets) is within max_distance
+    bits. Each group's representative is its most relevant member.
+    
+    Returns (representative, duplicates) pairs ordered by relevance.
+    """
+    by_url = {}
+    for source in sorted(sources, key=lambda x: x.relevance_score, reverse=True):
+        by_url.setdefault(canonical_url(source.url), []).append(source)
+    
+    groups: List[List[Source]] = []
+    fingerprints: List[Tuple[Optional[int], Optional[int]]] = []
+    
+    for members in by_url.values():
+        # Fetch fallback text is the same for every page and says nothing about it
+        contents = [
+            m.content for m in members
+            if m.content and not web_fetch.is_placeholder(m.url, m.content)
+        ]
+        content_hash = simhash(max(contents, key=len)) if contents else None
+        snippet_hash = simhash(members[0].snippet) if members[0].snippet else None
+        
+        match = None
+        if max_distance >= 0:
+            for index, (other_content, other_snippet) in enumerate(fingerprints):
+                if (
+                    (content_hash is not None and other_content is not None
+                     and hamming_distance(content_hash, other_content) <= max_distance)
+                    or (snippet_hash is not None and other_snippet is not None
+                        and hamming_distance(snippet_hash, other_snippet) <= max_distance)
+                ):
+                    match = index
+                    break
+        
+        if match is None:
+            groups.append(list(members))
+            fingerprints.append((content_hash, snippet_hash))
+        else:
+            groups[match].extend(members)
+    
+    result = []
+    for members in groups:
+        members.sort(key=lambda x: x.relevance_score, reverse=True)
+        result.append((members[0], members[1:]))
+    return result
+
+
+def dedupe_sources(sources: List[Source]) -> List[Source]:
+    """
+    Keep the most relevant source of each duplicate group.
+    
+    If the representative has less content than one of its duplicates (e.g.
+    only a search snippet), the longer content is carried over so the same
+    article is not fetched again.
+    """
+    unique_sources = []
+    for source, duplicates in group_duplicates(sources):
+        longest = max((d.content or "" for d in duplicates), key=len, default="")
+        if len(longest) > len(source.content or ""):
+            source.content = longest
+        unique_sources.append(source)
+    return unique_sources
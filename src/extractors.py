@@ -0,0 +1,246 @@
+"""Pluggable HTML-to-text extractors used by the web fetch tool."""
+import importlib
+import inspect
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Type
+from bs4 import BeautifulSoup
+import html2text
+
+# lxml is optional - without it the html2text extractor is used
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+
+# Elements that never contain article text
+BOILERPLATE_TAGS = [
+    "script", "style", "noscript", "nav", "footer", "header", "aside",
+    "form", "iframe", "svg", "button", "select", "template"
+]
+
+# Elements whose text is emitted as a line of output
+BLOCK_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "pre", "blockquote", "td", "dd", "dt", "figcaption")
+
+# class/id hints used to score candidate containers (readability style)
+NEGATIVE_HINTS = re.compile(
+    r"comment|sidebar|footer|footnote|masthead|menu|nav|related|share|social|"
+    r"sponsor|promo|advert|\bads?\b|cookie|banner|popup|modal|subscribe|newsletter|breadcrumb",
+    re.I
+)
+POSITIVE_HINTS = re.compile(r"article|body|content|entry|main|page|post|story|text|blog", re.I)
+
+WHITESPACE = re.compile(r"\s+")
+
+
+class ContentExtractor(ABC):
+    """Base class for extractors: turn an HTML page into plain text."""
+    
+    name = "base"
+    
+    @abstractmethod
+    def extract(self, html: str, max_chars: int) -> str:
+        """Return at most max_chars of main text (plus "..." if truncated)."""
+
+
+class Html2TextExtractor(ContentExtractor):
+    """Original BeautifulSoup + html2text pipeline (markdown output)."""
+    
+    name = "html2text"
+    
+    def extract(self, html: str, max_chars: int) -> str:
+        h2t = html2text.HTML2Text()
+        h2t.ignore_links = False
+        h2t.ignore_images = True
+        h2t.body_width = 0
+        
+        # Parse HTML and extract text
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Remove script and style elements
+        for script in soup(["script", "style", "nav", "footer", "header"]):
+            script.decompose()
+        
+        # Convert to markdown-like text
+        text = h2t.handle(str(soup))
+        
+        # Clean up and limit length
+        text = text.strip()
+        if len(text) > max_chars:
+            text = text[:max_chars] + "..."
+        
+        return text
+
+
+class LxmlExtractor(ContentExtractor):
+    """
+    Single-pass extractor built on lxml.
+    
+    Parses once, picks the main content container with readability-style
+    scoring and stops emitting text as soon as the character budget is used.
+    """
+    
+    name = "lxml"
+    
+    def extract(self, html: str, max_chars: int) -> str:
+        root = self._parse(html)
+        
+        # Drop boilerplate subtrees before scoring
+        etree.strip_elements(root, *BOILERPLATE_TAGS, etree.Comment, with_tail=False)
+        
+        container = self._main_container(root)
+        return self._render(container, max_chars)
+    
+    def _parse(self, html: str):
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # Unicode input with an XML encoding declaration must be bytes
+            return lxml.html.document_fromstring(html.encode("utf-8"))
+    
+    def _class_weight(self, element) -> float:
+        hints = f"{element.get('class', '')} {element.get('id', '')}"
+        weight = 0.0
+        if NEGATIVE_HINTS.search(hints):
+            weight -= 25
+        if POSITIVE_HINTS.search(hints):
+            weight += 25
+        return weight
+    
+    def _main_container(self, root):
+        """Score paragraph parents and return the best content container."""
+        scores: Dict = {}
+        
+        for paragraph in root.iter("p", "pre", "td"):
+            text = WHITESPACE.sub(" ", paragraph.text_content()).strip()
+            if len(text) < 25:
+                continue
+            
+            score = 1 + text.count(",") + min(len(text) / 100, 3)
+            parent = paragraph.getparent()
+            grandparent = parent.getparent() if parent is not None else None
+            
+            for candidate, share in ((parent, 1.0), (grandparent, 0.5)):
+                if candidate is None:
+                    continue
+                if candidate not in scores:
+                    scores[candidate] = self._class_weight(candidate)
+                scores[candidate] += score * share
+        
+        best, best_score = None, 0.0
+        for candidate, score in scores.items():
+            # Penalise link-heavy containers (menus, link farms)
+            text_length = len(candidate.text_content()) or 1
+            link_length = sum(len(a.text_content()) for a in candidate.iter("a"))
+            score *= 1 - min(link_length / text_length, 1)
+            if score > best_score:
+                best, best_score = candidate, score
+        
+        if best is not None:
+            return best
+        
+        body = root.find("body")
+        return body if body is not None else root
+    
+    def _render(self, container, max_chars: int) -> str:
+        lines = []
+        used = 0
+        emitted = set()
+        
+        for element in container.iter(*BLOCK_TAGS):
+            # Nested blocks (a <p> inside an <li>) were emitted with their parent
+            if any(ancestor in emitted for ancestor in element.iterancestors()):
+                continue
+            emitted.add(element)
+            
+            text = WHITESPACE.sub(" ", element.text_content()).strip()
+            if not text:
+                continue
+            
+            tag = element.tag
+            if tag[0] == "h" and tag[1:].isdigit():
+                text = "#" * int(tag[1]) + " " + text
+            elif tag == "li":
+                text = "- " + text
+            elif tag == "blockquote":
+                text = "> " + text
+            
+            lines.append(text)
+            used += len(text) + 2
+            if used > max_chars:
+                break
+        
+        text = "\n\n".join(lines)
+        if not text:
+            # No block markup at all - fall back to the raw container text
+            text = WHITESPACE.sub(" ", container.text_content()).strip()
+        
+        if len(text) > max_chars:
+            text = text[:max_chars] + "..."
+        
+        return text
+
+
+EXTRACTORS: Dict[str, Type[ContentExtractor]] = {
+    Html2TextExtractor.name: Html2TextExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+}
+
+_instances: Dict[str, ContentExtractor] = {}
+
+
+def register_extractor(extractor: Type[ContentExtractor]) -> Type[ContentExtractor]:
+    """
+    Make an extractor class available under its name (usable as a decorator).
+    
+    Classes that leave abstract methods unimplemented are rejected here, in
+    the main process, rather than when a worker first instantiates them.
+    Registrations only exist in the process that ran them, so define
+    extractors in a module listed in EXTRACT_PLUGINS to use them from the
+    extraction process pool.
+    """
+    if inspect.isabstract(extractor):
+        missing = ", ".join(sorted(extractor.__abstractmethods__))
+        raise TypeError(f"Extractor {extractor.__name__} does not implement: {missing}")
+    EXTRACTORS[extractor.name] = extractor
+    return extractor
+
+
+def load_plugins(modules: Iterable[str]) -> None:
+    """Import extractor plugin modules (they register their classes on import)."""
+    for module in modules:
+        importlib.import_module(module)
+
+
+def get_extractor(name: str) -> ContentExtractor:
+    """Return the extractor registered under name (html2text if unavailable)."""
+    if name == LxmlExtractor.name and lxml is None:
+        name = Html2TextExtractor.name
+    
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor: {name}")
+    
+    if name not in _instances:
+        _instances[name] = EXTRACTORS[name]()
+    return _instances[name]
+
+
+def extract_text(html: str, max_chars: int, backend: str = "lxml") -> str:
+    """
+    Extract main text with the given backend, falling back to html2text.
+    
+    Module-level so it can be shipped to a worker process.
+    """
+    extractor = get_extractor(backend)
+    
+    if extractor.name != Html2TextExtractor.name:
+        try:
+            text = extractor.extract(html, max_chars)
+            if text:
+                return text
+        except Exception:
+            pass
+    
+    return get_extractor(Html2TextExtractor.name).extract(html, max_chars)
@@ -1,42 +1,509 @@
 """LLM initialization and utilities."""
+import asyncio
+import hashlib
+import httpx
+import json
 import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_google_genai import ChatGoogleGenerativeAI
-from src.config import LLM_PROVIDER, MODEL_NAME, OPENAI_API_KEY, ANTHROPIC_API_KEY, GOOGLE_API_KEY
+from src.cache import SQLiteCache
+from src.cassette import cassette, CassetteMiss
+from src.context import estimate_tokens
+from src.runtime import close_with_loop, close_on_loop
+from src import tracing
+from src.config import (
+    LLM_PROVIDER,
+    MODEL_NAME,
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    ANTHROPIC_API_KEY,
+    GOOGLE_API_KEY,
+    CACHE_DIR,
+    LLM_CACHE_TTL,
+    LLM_CACHE_MAX_ENTRIES,
+    DEBUG
+)
 
+_llm_cache: Optional[SQLiteCache] = None
 
-def get_llm(temperature: float = 0.7):
-    """Initialize and return the LLM based on configuration."""
-    
-    if LLM_PROVIDER == "openai":
-        if not OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not found in environment variables")
-        return ChatOpenAI(
-            model=MODEL_NAME,
-            temperature=temperature,
-            api_key=OPENAI_API_KEY
+
+def get_llm_cache() -> SQLiteCache:
+    """Return the shared on-disk LLM response cache."""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = SQLiteCache(
+            CACHE_DIR / "llm.sqlite3",
+            ttl=LLM_CACHE_TTL,
+            max_entries=LLM_CACHE_MAX_ENTRIES
         )
-    elif LLM_PROVIDER == "anthropic":
-        if not ANTHROPIC_API_KEY:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
-        return ChatAnthropic(
-            model=MODEL_NAME,
-            temperature=temperature,
-            api_key=ANTHROPIC_API_KEY
+    return _llm_cache
+
+
+class CachedAnswer(BaseChatModel):
+    """
+    Chat model answering with a fixed text (an LLM cache hit).
+    
+    Cache hits go through the regular chat model machinery, so callbacks see
+    them like live answers (on_llm_new_token for stream_mode="messages").
+    """
+    
+    text: str
+    
+    @property
+    def _llm_type(self) -> str:
+        return "llm-cache"
+    
+    def _message(self, message_class):
+        return message_class(content=self.text, response_metadata={"cache_hit": True})
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._message(AIMessage))])
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        # A cached answer is replayed as a single chunk
+        chunk = ChatGenerationChunk(message=self._message(AIMessageChunk))
+        if run_manager:
+            await run_manager.on_llm_new_token(self.text, chunk=chunk)
+        yield chunk
+
+
+class CachedLLM:
+    """
+    Chat model wrapper that answers repeated prompts from the LLM cache.
+    
+    The key covers provider, model, temperature and a hash of the prompt
+    and of every option that shapes the answer (constructor options such as
+    max_tokens, options bound to the model such as tools, and per-call ones
+    such as stop), so only identical requests to the same model are reused.
+    """
+    
+    # Tells TracedLLM that every call consults the cache
+    caches_responses = True
+    
+    def __init__(self, llm, temperature: float, cache: SQLiteCache, options: Optional[Dict[str, Any]] = None):
+        self.llm = llm
+        self.temperature = temperature
+        self.cache = cache
+        self.options = options or {}
+    
+    def _cache_key(self, prompt: Any, kwargs: Dict[str, Any]) -> str:
+        # config only carries callbacks, tags and metadata
+        options = {
+            "model": self.options,
+            "bound": getattr(self.llm, "kwargs", None),
+            "call": {name: value for name, value in kwargs.items() if name != "config"}
+        }
+        request = json.dumps([prompt, options], default=str, sort_keys=True)
+        digest = hashlib.sha256(request.encode("utf-8")).hexdigest()
+        return f"{LLM_PROVIDER}|{MODEL_NAME}|{self.temperature}|{digest}"
+    
+    async def _lookup(self, key: str) -> Optional[str]:
+        # SQLite calls block, so they run off the event loop
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None and DEBUG:
+            print(f"[LLM] Cache hit ({MODEL_NAME})")
+        return cached
+    
+    async def ainvoke(self, prompt: Any, *args, **kwargs) -> AIMessage:
+        key = self._cache_key(prompt, kwargs)
+        
+        cached = await self._lookup(key)
+        if cached is not None:
+            return await CachedAnswer(text=cached).ainvoke(prompt, *args, **kwargs)
+        
+        response = await self.llm.ainvoke(prompt, *args, **kwargs)
+        await asyncio.to_thread(self.cache.set, key, response.content)
+        return response
+    
+    async def astream(self, prompt: Any, *args, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        key = self._cache_key(prompt, kwargs)
+        
+        cached = await self._lookup(key)
+        if cached is not None:
+            async for chunk in CachedAnswer(text=cached).astream(prompt, *args, **kwargs):
+                yield chunk
+            return
+        
+        response = None
+        async for chunk in self.llm.astream(prompt, *args, **kwargs):
+            response = chunk if response is None else response + chunk
+            yield chunk
+        
+        if response is not None:
+            await asyncio.to_thread(self.cache.set, key, response.content)
+    
+    def __getattr__(self, name: str):
+        return getattr(self.llm, name)
+
+
+class TracedLLM:
+    """
+    Chat model wrapper recording every call as an "llm" span of the current
+    run, with its token counts (estimated when the provider reports none)
+    and whether the answer came from the LLM cache (cache_lookup marks calls
+    that consulted it at all).
+    """
+    
+    def __init__(self, llm):
+        self.llm = llm
+        self.attributes = {"model": MODEL_NAME}
+        if getattr(llm, "caches_responses", False):
+            self.attributes["cache_lookup"] = True
+    
+    @staticmethod
+    def _record(span, prompt: Any, response) -> None:
+        if response.response_metadata.get("cache_hit"):
+            span.set(cache_hit=True)
+            return
+        
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            span.set(prompt_tokens=usage.get("input_tokens", 0), completion_tokens=usage.get("output_tokens", 0))
+        else:
+            prompt_text = prompt if isinstance(prompt, str) else json.dumps(prompt, default=str)
+            span.set(
+                prompt_tokens=estimate_tokens(prompt_text),
+                completion_tokens=estimate_tokens(message_text(response.content)),
+                tokens_estimated=True
+            )
+    
+    async def ainvoke(self, prompt: Any, *args, **kwargs) -> AIMessage:
+        with tracing.span("llm", **self.attributes) as span:
+            response = await self.llm.ainvoke(prompt, *args, **kwargs)
+            self._record(span, prompt, response)
+            return response
+    
+    async def astream(self, prompt: Any, *args, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        # A context variable cannot stay set across yields, so the span is
+        # not made current and is closed by hand
+        span = tracing.detached_span("llm", streamed=True, **self.attributes)
+        if span is None:
+            async for chunk in self.llm.astream(prompt, *args, **kwargs):
+                yield chunk
+            return
+        
+        response = None
+        try:
+            async for chunk in self.llm.astream(prompt, *args, **kwargs):
+                if response is None:
+                    span.set(first_chunk=round(time.time() - span.start, 3))
+                response = chunk if response is None else response + chunk
+                yield chunk
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if response is not None:
+                self._record(span, prompt, response)
+            tracing.close_span(span)
+    
+    def __getattr__(self, name: str):
+        return getattr(self.llm, name)
+
+
+def prompt_key(prompt: Any) -> str:
+    """Cassette key for a prompt (a string or a list of messages), independent of the model."""
+    if isinstance(prompt, str):
+        text = prompt
+    elif isinstance(prompt, list):
+        text = "\n".join(message_text(getattr(message, "content", message)) for message in prompt)
+    else:
+        text = str(prompt)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class RecordingLLM:
+    """Chat model wrapper that records every answer in the cassette (CASSETTE_MODE=record)."""
+    
+    def __init__(self, llm):
+        self.llm = llm
+    
+    async def ainvoke(self, prompt: Any, *args, **kwargs) -> AIMessage:
+        return await cassette.through(
+            "llm",
+            prompt_key(prompt),
+            lambda: self.llm.ainvoke(prompt, *args, **kwargs),
+            encode=lambda response: message_text(response.content)
         )
-    elif LLM_PROVIDER == "google":
-        if not GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY not found in environment variables")
-        return ChatGoogleGenerativeAI(
-            model=MODEL_NAME,
-            temperature=temperature,
-            google_api_key=GOOGLE_API_KEY
+    
+    async def astream(self, prompt: Any, *args, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        # Chunks are kept with their time offsets so replay can reproduce
+        # time-to-first-token as well as the total
+        start = time.perf_counter()
+        chunks = []
+        async for chunk in self.llm.astream(prompt, *args, **kwargs):
+            text = message_text(chunk.content)
+            if text:
+                chunks.append([round(time.perf_counter() - start, 4), text])
+            yield chunk
+        
+        cassette.record(
+            "llm",
+            prompt_key(prompt),
+            "".join(text for _, text in chunks),
+            time.perf_counter() - start,
+            chunks=chunks
         )
+    
+    def __getattr__(self, name: str):
+        return getattr(self.llm, name)
+
+
+class ReplayLLM(BaseChatModel):
+    """
+    Chat model answering from the cassette (CASSETTE_MODE=replay).
+    
+    Needs no API key. Streamed answers are replayed chunk by chunk, so
+    stream_mode="messages" consumers see them like live ones. A prompt with
+    no recording raises CassetteMiss.
+    """
+    
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-replay"
+    
+    def _entry(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+        key = prompt_key(messages)
+        entry = cassette.lookup("llm", key)
+        if entry is None:
+            raise CassetteMiss(f"No recorded LLM answer for prompt {key[:12]}")
+        return entry
+    
+    def _result(self, entry: Dict[str, Any]) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=entry["value"]))])
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        entry = self._entry(messages)
+        time.sleep(entry["elapsed"] * cassette.latency_scale)
+        return self._result(entry)
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        entry = self._entry(messages)
+        await cassette.delay(entry["elapsed"])
+        return self._result(entry)
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        entry = self._entry(messages)
+        previous = 0.0
+        for offset, text in entry.get("chunks") or [[entry["elapsed"], entry["value"]]]:
+            time.sleep(max(0.0, offset - previous) * cassette.latency_scale)
+            previous = offset
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        entry = self._entry(messages)
+        previous = 0.0
+        for offset, text in entry.get("chunks") or [[entry["elapsed"], entry["value"]]]:
+            await cassette.delay(offset - previous)
+            previous = offset
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+class LLMClientRegistry:
+    """
+    Memoises chat model clients by (provider, model, temperature, options).
+    
+    Clients are shared across nodes and concurrent runs on the same event
+    loop, and all clients of a provider share one pooled HTTP client owned by
+    the registry. Connections are bound to the loop that opened them, so the
+    registry starts over when it sees a different loop; the old clients are
+    closed on their own loop (when it shuts down, or right away if it is
+    still running in another thread).
+    """
+    
+    def __init__(self):
+        self._clients: Dict[Tuple, Any] = {}
+        self._http_clients: Dict[str, Any] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closer: Optional[AsyncIterator] = None
+        self._lock = threading.Lock()
+    
+    def get(self, temperature: float, **options):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        
+        key = (LLM_PROVIDER, MODEL_NAME, temperature, tuple(sorted(options.items())))
+        
+        with self._lock:
+            if loop is not self._loop:
+                # Clients from another loop cannot be reused; close them there
+                previous = self._detach()
+                close_on_loop(previous[0], lambda: self._close(*previous[1:]))
+                self._loop = loop
+                if loop is not None:
+                    clients, http_clients = self._clients, self._http_clients
+                    self._closer = close_with_loop(lambda: self._close(clients, http_clients))
+            
+            if key not in self._clients:
+                self._clients[key] = self._create(temperature, options)
+            return self._clients[key]
+    
+    def _detach(self) -> Tuple[Optional[asyncio.AbstractEventLoop], Dict[Tuple, Any], Dict[str, Any]]:
+        """Hand over the current loop's clients and start an empty set (lock held)."""
+        previous = (self._loop, self._clients, self._http_clients)
+        self._clients = {}
+        self._http_clients = {}
+        self._loop = None
+        self._closer = None
+        return previous
+    
+    def _shared_http_client(self, provider: str = "openai"):
+        """The pooled HTTP client all of a provider's models send requests through."""
+        client = self._http_clients.get(provider)
+        if client is None or client.is_closed:
+            if provider == "anthropic":
+                # The Anthropic SDK only accepts its own httpx build
+                import anthropic
+                client = anthropic.DefaultAsyncHttpxClient()
+            else:
+                client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(120.0, connect=10.0),
+                    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+                )
+            self._http_clients[provider] = client
+        return client
+    
+    def _use_shared_pool(self, llm):
+        """
+        Point an Anthropic or Google model at the provider's shared pool.
+        
+        Neither wrapper takes an HTTP client, so their SDK client is replaced
+        with one built on the pool. Integration versions without the hooks
+        used here keep their own transport.
+        """
+        try:
+            if LLM_PROVIDER == "anthropic":
+                import anthropic
+                llm._async_client = anthropic.AsyncClient(
+                    **llm._client_params,
+                    http_client=self._shared_http_client("anthropic")
+                )
+            elif LLM_PROVIDER == "google":
+                from google import genai
+                llm.client = genai.Client(
+                    api_key=GOOGLE_API_KEY,
+                    http_options=genai.types.HttpOptions(httpx_async_client=self._shared_http_client("google"))
+                )
+        except (ImportError, AttributeError, TypeError, ValueError) as e:
+            if DEBUG:
+                print(f"[LLM] Using the {LLM_PROVIDER} client's own connection pool: {e}")
+    
+    def _create(self, temperature: float, options: Dict[str, Any]):
+        """Initialize the LLM based on configuration."""
+        
+        if LLM_PROVIDER == "openai":
+            if not OPENAI_API_KEY:
+                raise ValueError("OPENAI_API_KEY not found in environment variables")
+            return ChatOpenAI(
+                model=MODEL_NAME,
+                temperature=temperature,
+                api_key=OPENAI_API_KEY,
+                base_url=OPENAI_BASE_URL,
+                http_async_client=self._shared_http_client("openai"),
+                **options
+            )
+        elif LLM_PROVIDER == "anthropic":
+            if not ANTHROPIC_API_KEY:
+                raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
+            llm = ChatAnthropic(
+                model=MODEL_NAME,
+                temperature=temperature,
+                api_key=ANTHROPIC_API_KEY,
+                **options
+            )
+            self._use_shared_pool(llm)
+            return llm
+        elif LLM_PROVIDER == "google":
+            if not GOOGLE_API_KEY:
+                raise ValueError("GOOGLE_API_KEY not found in environment variables")
+            llm = ChatGoogleGenerativeAI(
+                model=MODEL_NAME,
+                temperature=temperature,
+                google_api_key=GOOGLE_API_KEY,
+                **options
+            )
+            self._use_shared_pool(llm)
+            return llm
+        else:
+            raise ValueError(f"Unknown LLM provider: {LLM_PROVIDER}")
+    
+    @staticmethod
+    async def _close(clients: Dict[Tuple, Any], http_clients: Dict[str, Any]):
+        for client in list(clients.values()):
+            # Some integrations expose their own async shutdown hook
+            close = getattr(client, "aclose", None)
+            if close is not None and asyncio.iscoroutinefunction(close):
+                try:
+                    await close()
+                except Exception as e:
+                    if DEBUG:
+                        print(f"[LLM] Error closing client: {e}")
+        clients.clear()
+        
+        for http_client in list(http_clients.values()):
+            if not http_client.is_closed:
+                await http_client.aclose()
+        http_clients.clear()
+    
+    async def aclose(self):
+        """Release all clients and close the shared connection pools."""
+        with self._lock:
+            _, clients, http_clients = self._detach()
+        await self._close(clients, http_clients)
+
+
+def get_llm(temperature: float = 0.7, cache: bool = False, **options):
+    """
+    Return the (memoised) LLM client based on configuration.
+    
+    Extra options are passed to the chat model constructor. With cache=True
+    the model is wrapped in CachedLLM. In cassette record mode answers
+    (cached ones included) are recorded; in replay mode they come from the
+    cassette instead of a provider. With tracing or metrics on, calls are
+    recorded as spans (TracedLLM).
+    """
+    if cassette.replaying:
+        llm = ReplayLLM()
     else:
-        raise ValueError(f"Unknown LLM provider: {LLM_PROVIDER}")
+        llm = llm_clients.get(temperature, **options)
+        if cache and LLM_CACHE_TTL > 0:
+            llm = CachedLLM(llm, temperature, get_llm_cache(), options)
+        if cassette.recording:
+            llm = RecordingLLM(llm)
+    
+    return TracedLLM(llm) if tracing.INSTRUMENTED else llm
+
+
+def message_text(content: Any) -> str:
+    """Flatten message content (a string or a list of content blocks) to text."""
+    if isinstance(content, str):
+        return content
+    
+    parts = []
+    for block in content or []:
+        if isinstance(block, str):
+            parts.append(block)
+        elif isinstance(block, dict) and block.get("type", "text") == "text":
+            parts.append(block.get("text", ""))
+    return "".join(parts)
 
 
 def create_prompt(template: str, **kwargs) -> str:
     """Format a prompt template with variables."""
     return template.format(**kwargs)
+
+
+# Singleton client registry
+llm_clients = LLMClientRegistry()
@@ -1,14 +1,49 @@
 """MCP tool integrations for web search and filesystem operations."""
+import asyncio
+import codecs
+import importlib.util
 import json
 import httpx
+import multiprocessing
 import os
-from typing import List, Dict, Any
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 from tavily import TavilyClient
-from bs4 import BeautifulSoup
-import html2text
 from src.state import Source
-from src.config import DEBUG
+from src.extractors import extract_text, load_plugins
+from src.cache import SQLiteCache, CacheEntry
+from src.cassette import cassette
+from src.runtime import close_with_loop, close_on_loop
+from src import tracing
+from src.config import (
+    DEBUG,
+    CACHE_DIR,
+    TAVILY_API_BASE_URL,
+    SEARCH_CONCURRENCY,
+    SEARCH_INCLUDE_RAW_CONTENT,
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_MAX_ENTRIES,
+    PAGE_CACHE_ENABLED,
+    PAGE_CACHE_DEFAULT_TTL,
+    PAGE_CACHE_MAX_ENTRIES,
+    FETCH_CONCURRENCY,
+    FETCH_MAX_CONNECTIONS,
+    FETCH_MAX_CONNECTIONS_PER_HOST,
+    FETCH_HTTP2,
+    FETCH_TIMEOUT,
+    FETCH_MAX_BYTES,
+    EXTRACT_BACKEND,
+    EXTRACT_MAX_CHARS,
+    EXTRACT_PROCESS_WORKERS,
+    EXTRACT_THREAD_WORKERS,
+    EXTRACT_PROCESS_THRESHOLD,
+    EXTRACT_PLUGINS
+)
 
 # Ensure environment variables are loaded
 load_dotenv()
@@ -23,6 +58,14 @@ except:
     pass
 
 
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a query for cache keys: case, whitespace and trailing
+    punctuation only. Word order and symbols ("c++", "c#", ".net") matter.
+    """
+    return " ".join(query.lower().split()).rstrip("?!.,;: ")
+
+
 class MCPWebSearch:
     """Web search using Tavily API."""
     
@@ -31,7 +74,24 @@ class MCPWebSearch:
         self.use_tavily = bool(self.tavily_api_key)
         
         if self.use_tavily:
-            self.client = TavilyClient(api_key=self.tavily_api_key)
+            # api_base_url is only passed when set (older clients lack it)
+            client_options = {"api_base_url": TAVILY_API_BASE_URL} if TAVILY_API_BASE_URL else {}
+            self.client = TavilyClient(api_key=self.tavily_api_key, **client_options)
+        
+        # TavilyClient is synchronous, so searches run on a dedicated pool
+        # to keep the event loop free while they are in flight
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, SEARCH_CONCURRENCY),
+            thread_name_prefix="tavily-search"
+        )
+        
+        self.cache: Optional[SQLiteCache] = None
+        if SEARCH_CACHE_TTL > 0:
+            self.cache = SQLiteCache(
+                CACHE_DIR / "search.sqlite3",
+                ttl=SEARCH_CACHE_TTL,
+                max_entries=SEARCH_CACHE_MAX_ENTRIES
+            )
         
         if DEBUG:
             if self.use_tavily:
@@ -40,47 +100,103 @@ class MCPWebSearch:
                 print("[SEARCH] Using mock mode - set TAVILY_API_KEY for real search")
     
     async def search(self, query: str, max_results: int = 10) -> List[Source]:
-        """Execute web search and return sources."""
-        
+        """Execute web search and return sources (recorded or replayed per CASSETTE_MODE)."""
+        with tracing.span("search", query=query) as span:
+            sources = await cassette.through(
+                "search",
+                f"{normalize_query(query)}|{max_results}",
+                lambda: self._search(query, max_results),
+                encode=lambda sources: [source.model_dump() for source in sources],
+                decode=lambda items: [Source(**item) for item in items],
+                miss=lambda: self._mock_search(query, max_results)
+            )
+            span.set(results=len(sources))
+            return sources
+    
+    async def _search(self, query: str, max_results: int) -> List[Source]:
         if not self.use_tavily:
             return self._mock_search(query, max_results)
         
-        try:
-            # Use Tavily search
-            response = self.client.search(
+        search_depth = "basic"
+        cache_key = f"{normalize_query(query)}|{max_results}|{search_depth}|raw={SEARCH_INCLUDE_RAW_CONTENT}"
+        
+        if self.cache is not None:
+            tracing.current_span().set(cache_lookup=True)
+            # SQLite calls block, so they run off the event loop
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                if DEBUG:
+                    print(f"[SEARCH] Cache hit for: {query}")
+                tracing.current_span().set(cache_hit=True)
+                return [Source(**item) for item in cached]
+        
+        span = tracing.current_span()
+        submitted = time.perf_counter()
+        
+        def run_search():
+            # Time spent waiting for a free worker in the search pool
+            span.add("queue_wait", time.perf_counter() - submitted)
+            return self.client.search(
                 query=query,
                 max_results=min(max_results, 10),
-                search_depth="basic"
+                search_depth=search_depth,
+                include_raw_content=SEARCH_INCLUDE_RAW_CONTENT
             )
+        
+        try:
+            # Use Tavily search (blocking call, offloaded to the search pool)
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self._executor, run_search)
             
             sources = []
             if 'results' in response:
                 for i, item in enumerate(response['results']):
+                    content = item.get('content', '')  # Tavily returns full content
+                    
+                    # Raw page text (when requested) is usually richer than the summary
+                    raw_content = (item.get('raw_content') or '').strip()
+                    if len(raw_content) > len(content):
+                        content = raw_content
+                        if len(content) > EXTRACT_MAX_CHARS:
+                            content = content[:EXTRACT_MAX_CHARS] + "..."
+                    
                     sources.append(Source(
                         url=item.get('url', ''),
                         title=item.get('title', ''),
-                        snippet=item.get('content', '')[:200],  # Tavily returns full content
-                        content=item.get('content', ''),  # Store full content
+                        snippet=item.get('content', '')[:200],
+                        content=content,  # Store full content
                         relevance_score=item.get('score', 1.0 - (i * 0.05))
                     ))
             
             if DEBUG:
                 print(f"[SEARCH] Found {len(sources)} results for: {query}")
             
-            return sources
+            if self.cache is not None and sources:
+                await asyncio.to_thread(self.cache.set, cache_key, [source.model_dump() for source in sources])
             
+            return sources
+        
         except Exception as e:
             if DEBUG:
                 print(f"[Tavily Search Error] {type(e).__name__}: {e}")
+            span.set(fallback=f"{type(e).__name__}: {e}")
             return self._mock_search(query, max_results)
     
     def _mock_search(self, query: str, max_results: int) -> List[Source]:
         """Mock search results for testing."""
+        # Distinct angles so the mock articles are not collapsed as duplicates
+        angles = [
+            "gives an overview of",
+            "reviews recent developments in",
+            "explains the technical details behind",
+            "collects practical applications of",
+            "discusses open challenges for",
+        ]
         mock_results = [
             Source(
                 url=f"https://example.com/article-{i}",
                 title=f"Article {i}: {query}",
-                snippet=f"This is a relevant article about {query}. It contains important information and insights.",
+                snippet=f"Article {i} {angles[i - 1]} {query}. It contains important information and insights.",
                 relevance_score=0.9 - (i * 0.1)
             )
             for i in range(1, min(max_results + 1, 6))
@@ -88,48 +204,388 @@ class MCPWebSearch:
         return mock_results
 
 
+# Content types handled by the fetcher: HTML goes through the extractor,
+# plain text is used as-is, anything else is skipped before the body is read
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_CONTENT_TYPES = ("text/plain", "text/markdown")
+
+
 class MCPWebFetch:
     """Fetch full article content from web pages."""
     
     def __init__(self):
-        self.h2t = html2text.HTML2Text()
-        self.h2t.ignore_links = False
-        self.h2t.ignore_images = True
-        self.h2t.body_width = 0
+        # HTTP/2 needs the optional h2 package (pip install httpx[http2])
+        self.http2 = FETCH_HTTP2 and importlib.util.find_spec("h2") is not None
+        if FETCH_HTTP2 and not self.http2 and DEBUG:
+            print("[FETCH] FETCH_HTTP2 set but h2 is not installed - using HTTP/1.1")
+        
+        # The pooled client and per-host limits are bound to the event loop
+        # that created them, so they are rebuilt if the loop changes (the old
+        # client is closed on its own loop)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client_closer = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        
+        # Optional custom transport for the pooled client (e.g. an
+        # httpx.MockTransport serving fixtures in offline benchmarks)
+        self.transport: Optional[httpx.AsyncBaseTransport] = None
+        
+        # Concurrent fetches of the same URL (e.g. from parallel subtopic
+        # branches) share a single request
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # Extraction is CPU-bound, so it never runs on the event loop thread;
+        # the pools are created on first use. Plugin extractors are loaded
+        # here and again in each worker process
+        load_plugins(EXTRACT_PLUGINS)
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        
+        # Extracted pages are cached together with their validators
+        # (ETag/Last-Modified) so stale entries can be revalidated cheaply
+        self.cache: Optional[SQLiteCache] = None
+        if PAGE_CACHE_ENABLED:
+            self.cache = SQLiteCache(
+                CACHE_DIR / "pages.sqlite3",
+                ttl=PAGE_CACHE_DEFAULT_TTL,
+                max_entries=PAGE_CACHE_MAX_ENTRIES
+            )
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            if self._client is not None:
+                close_on_loop(self._client_loop, self._client.aclose)
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=FETCH_TIMEOUT,
+                http2=self.http2,
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=FETCH_MAX_CONNECTIONS,
+                    max_keepalive_connections=FETCH_MAX_CONNECTIONS,
+                    keepalive_expiry=30.0
+                )
+            )
+            self._client_loop = loop
+            self._client_closer = close_with_loop(self._client.aclose)
+            self._host_semaphores = {}
+        
+        return self._client
+    
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """Per-host connection limit (httpx only limits the pool as a whole)."""
+        host = urlsplit(url).netloc.lower()
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(max(1, FETCH_MAX_CONNECTIONS_PER_HOST))
+        return self._host_semaphores[host]
+    
+    async def aclose(self):
+        """Close the shared client and shut down the extraction pools."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+        self._client_closer = None
+        self._host_semaphores = {}
+        
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False)
+        self._thread_pool = None
+        self._process_pool = None
+    
+    @staticmethod
+    def _start_process_pool() -> ProcessPoolExecutor:
+        """
+        Start the extraction worker processes.
+        
+        The process already runs threads (search pool, metrics server, the
+        Streamlit loop), so workers are not forked from it: they come from a
+        forkserver with the extractors and EXTRACT_PLUGINS preloaded, or are
+        spawned where that is unavailable (and import the plugins on start).
+        One no-op job per worker starts them all up front.
+        """
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["src.extractors", *EXTRACT_PLUGINS])
+        else:
+            context = multiprocessing.get_context("spawn")
+        
+        pool = ProcessPoolExecutor(
+            max_workers=EXTRACT_PROCESS_WORKERS,
+            mp_context=context,
+            initializer=load_plugins,
+            initargs=(EXTRACT_PLUGINS,)
+        )
+        for _ in range(EXTRACT_PROCESS_WORKERS):
+            pool.submit(extract_text, "", EXTRACT_MAX_CHARS, EXTRACT_BACKEND)
+        return pool
+    
+    def _extraction_pool(self, size: int):
+        """Pick the executor for a page of the given size."""
+        if size >= EXTRACT_PROCESS_THRESHOLD and EXTRACT_PROCESS_WORKERS > 0:
+            if self._process_pool is None:
+                self._process_pool = self._start_process_pool()
+            return self._process_pool
+        
+        if EXTRACT_THREAD_WORKERS > 0:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=EXTRACT_THREAD_WORKERS,
+                    thread_name_prefix="html-extract"
+                )
+            return self._thread_pool
+        
+        return None
+    
+    async def extract(self, html: str) -> str:
+        """Run text extraction off the event loop."""
+        loop = asyncio.get_running_loop()
+        pool = self._extraction_pool(len(html))
+        
+        with tracing.span("extract", chars=len(html)):
+            try:
+                return await loop.run_in_executor(pool, extract_text, html, EXTRACT_MAX_CHARS, EXTRACT_BACKEND)
+            except BrokenProcessPool:
+                # A crashed worker breaks the whole pool; rebuild it next time
+                # and finish this page in a thread instead. Shutting it down
+                # reaps the surviving workers and fails the queued jobs now
+                if pool is not None and pool is self._process_pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._process_pool = None
+                return await loop.run_in_executor(
+                    self._thread_pool, extract_text, html, EXTRACT_MAX_CHARS, EXTRACT_BACKEND
+                )
+    
+    async def fetch_many(self, urls: List[str], concurrency: int = FETCH_CONCURRENCY) -> List[str]:
+        """Fetch several URLs in parallel, returning content in input order."""
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def bounded_fetch(url: str) -> str:
+            async with semaphore:
+                return await self.fetch(url)
+        
+        results = await asyncio.gather(
+            *(bounded_fetch(url) for url in urls),
+            return_exceptions=True
+        )
+        
+        return [
+            self._mock_fetch(url) if isinstance(result, BaseException) else result
+            for url, result in zip(urls, results)
+        ]
+    
+    def _page_cache_key(self, url: str) -> str:
+        # Extracted text depends on the extractor settings, so they are part of the key
+        return f"{EXTRACT_BACKEND}|{EXTRACT_MAX_CHARS}|{url}"
+    
+    def is_cached(self, url: str) -> bool:
+        """Whether fetch(url) can be answered from the page cache without network I/O."""
+        return self.cache is not None and self.cache.contains(self._page_cache_key(url))
     
     async def fetch(self, url: str) -> str:
-        """Fetch full content from URL."""
+        """Fetch full content from URL (served from the page cache when fresh)."""
+        loop = asyncio.get_running_loop()
         
-        try:
-            async with httpx.AsyncClient(follow_redirects=True, timeout=10.0) as client:
-                response = await client.get(url)
-                response.raise_for_status()
-                
-                # Parse HTML and extract text
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Remove script and style elements
-                for script in soup(["script", "style", "nav", "footer", "header"]):
-                    script.decompose()
-                
-                # Convert to markdown-like text
-                text = self.h2t.handle(str(soup))
-                
-                # Clean up and limit length
-                text = text.strip()
-                if len(text) > 3000:
-                    text = text[:3000] + "..."
-                
-                if DEBUG:
-                    print(f"[FETCH] Retrieved {len(text)} chars from {url}")
-                
+        with tracing.span("fetch", url=url) as span:
+            pending = self._inflight.get(url)
+            if pending is not None and pending.get_loop() is loop:
+                span.set(shared=True)
+                try:
+                    return await asyncio.shield(pending)
+                except asyncio.CancelledError:
+                    # Only the fetch being shared was cancelled, not this one:
+                    # do the fetch here instead
+                    if not pending.cancelled():
+                        raise
+                    span.set(shared=False)
+            
+            future = loop.create_future()
+            self._inflight[url] = future
+            try:
+                text = await cassette.through(
+                    "fetch", url, lambda: self._fetch(url), miss=lambda: self._mock_fetch(url)
+                )
+                future.set_result(text)
                 return text
-                
+            except Exception as e:
+                # Waiters re-raise the same error; retrieving it here keeps an
+                # unshared failure from being logged as never retrieved
+                future.set_exception(e)
+                future.exception()
+                raise
+            except BaseException:
+                future.cancel()
+                raise
+            finally:
+                if self._inflight.get(url) is future:
+                    del self._inflight[url]
+    
+    async def _fetch(self, url: str) -> str:
+        entry = None
+        if self.cache is not None:
+            tracing.current_span().set(cache_lookup=True)
+            # SQLite calls block, so they run off the event loop
+            entry = await asyncio.to_thread(self.cache.get_entry, self._page_cache_key(url), allow_stale=True)
+            if entry is not None and entry.fresh:
+                if DEBUG:
+                    print(f"[FETCH] Cache hit for {url}")
+                tracing.current_span().set(cache_hit=True)
+                return entry.value["text"]
+        
+        try:
+            text = await self._fetch_live(url, entry)
+            
+            if DEBUG:
+                print(f"[FETCH] Retrieved {len(text)} chars from {url}")
+            
+            return text
+        
         except Exception as e:
             if DEBUG:
                 print(f"[Fetch Error] {url}: {e}")
+            tracing.current_span().set(fallback=f"{type(e).__name__}: {e}")
+            
+            # A stale copy of the real page beats placeholder content
+            if entry is not None:
+                return entry.value["text"]
             return self._mock_fetch(url)
     
+    async def _fetch_live(self, url: str, entry: Optional[CacheEntry] = None) -> str:
+        """Download and extract a page, revalidating a cached copy if there is one."""
+        headers = {}
+        if entry is not None:
+            if entry.value.get("etag"):
+                headers["If-None-Match"] = entry.value["etag"]
+            if entry.value.get("last_modified"):
+                headers["If-Modified-Since"] = entry.value["last_modified"]
+        
+        span = tracing.current_span()
+        client = self._get_client()
+        queued = time.perf_counter()
+        async with self._host_semaphore(url):
+            # Time spent waiting for the per-host connection limit
+            span.add("queue_wait", time.perf_counter() - queued)
+            async with client.stream("GET", url, headers=headers) as response:
+                span.set(status=response.status_code)
+                if response.status_code == 304 and entry is not None:
+                    ttl = self._freshness_lifetime(response.headers)
+                    # A 304 may carry new validators, which replace the stored ones
+                    value = dict(entry.value)
+                    for field, header in (("etag", "etag"), ("last_modified", "last-modified"), ("cache_control", "cache-control")):
+                        if response.headers.get(header):
+                            value[field] = response.headers[header]
+                    
+                    if ttl is None:
+                        await asyncio.to_thread(self.cache.delete, self._page_cache_key(url))
+                    elif value != entry.value:
+                        await asyncio.to_thread(self.cache.set, self._page_cache_key(url), value, ttl=ttl)
+                    else:
+                        await asyncio.to_thread(self.cache.refresh, self._page_cache_key(url), ttl=ttl)
+                    if DEBUG:
+                        print(f"[FETCH] Revalidated {url} (304 Not Modified)")
+                    return entry.value["text"]
+                
+                response.raise_for_status()
+                
+                # Gate on the headers so binaries and PDFs are never downloaded
+                content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                if content_type and content_type not in HTML_CONTENT_TYPES + TEXT_CONTENT_TYPES:
+                    raise ValueError(f"Unsupported content type: {content_type}")
+                
+                body = await self._read_capped(response)
+                span.add("bytes", response.num_bytes_downloaded)
+        
+        if content_type in TEXT_CONTENT_TYPES:
+            text = body.strip()
+            if len(text) > EXTRACT_MAX_CHARS:
+                text = text[:EXTRACT_MAX_CHARS] + "..."
+        else:
+            text = await self.extract(body)
+        
+        if self.cache is not None:
+            ttl = self._freshness_lifetime(response.headers)
+            if ttl is not None:
+                await asyncio.to_thread(
+                    self.cache.set,
+                    self._page_cache_key(url),
+                    {
+                        "text": text,
+                        "etag": response.headers.get("etag"),
+                        "last_modified": response.headers.get("last-modified"),
+                        "cache_control": response.headers.get("cache-control")
+                    },
+                    ttl=ttl
+                )
+        
+        return text
+    
+    def _freshness_lifetime(self, headers: httpx.Headers) -> Optional[float]:
+        """
+        Seconds a response stays fresh, or None if it must not be stored.
+        
+        Time the response already spent in upstream caches (Age) is deducted
+        from max-age and Expires.
+        """
+        directives = {}
+        for part in headers.get("cache-control", "").lower().split(","):
+            name, _, value = part.strip().partition("=")
+            if name:
+                directives[name] = value.strip('"')
+        
+        if "no-store" in directives:
+            return None
+        if "no-cache" in directives:
+            return 0.0
+        
+        age = headers.get("age", "").strip()
+        age = float(age) if age.isdigit() else 0.0
+        
+        for name in ("s-maxage", "max-age"):
+            if directives.get(name, "").isdigit():
+                return max(0.0, float(directives[name]) - age)
+        
+        expires = headers.get("expires")
+        if expires:
+            try:
+                expires_at = parsedate_to_datetime(expires).timestamp()
+                date = headers.get("date")
+                now = parsedate_to_datetime(date).timestamp() if date else time.time()
+                return max(0.0, expires_at - now - age)
+            except (TypeError, ValueError):
+                return 0.0
+        
+        return PAGE_CACHE_DEFAULT_TTL
+    
+    async def _read_capped(self, response: httpx.Response) -> str:
+        """Stream and decode the body, stopping at FETCH_MAX_BYTES."""
+        try:
+            decoder = codecs.getincrementaldecoder(response.charset_encoding or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        
+        parts = []
+        received = 0
+        
+        async for chunk in response.aiter_bytes():
+            remaining = FETCH_MAX_BYTES - received
+            if len(chunk) >= remaining:
+                parts.append(decoder.decode(chunk[:remaining]))
+                break
+            received += len(chunk)
+            parts.append(decoder.decode(chunk))
+        
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
+    
+    def is_placeholder(self, url: str, content: str) -> bool:
+        """Whether content is the fallback text returned when url could not be fetched."""
+        return content == self._mock_fetch(url)
+    
     def _mock_fetch(self, url: str) -> str:
         """Fallback mock content."""
         return f"""Content from {url}
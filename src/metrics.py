@@ -0,0 +1,289 @@
+"""Process-wide metrics in Prometheus text format (see METRICS_PORT)."""
+import asyncio
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from src.config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT, DEBUG
+from src.runtime import close_with_loop
+
+# Default latency buckets (seconds), from a cache hit to a slow LLM call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+# How often the event-loop lag probe wakes up (seconds)
+LAG_PROBE_INTERVAL = 0.25
+
+# Call kinds that can be answered from a cache
+CACHED_KINDS = ("search", "fetch", "llm")
+
+_registry: List["Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric family with a fixed set of label names."""
+    
+    type = "untyped"
+    
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labels)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+    
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def _labels(self, key: Tuple[str, ...], extra: Optional[Dict[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in sorted(values.items())]
+    
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"] + self.samples()
+
+
+class Counter(Metric):
+    type = "counter"
+    
+    def inc(self, amount: float = 1, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    type = "gauge"
+    
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self._values[self._key(labels)] = value
+    
+    def inc(self, amount: float = 1, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount: float = 1, **labels: Any):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+    
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+    
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = {key: {**state, "counts": list(state["counts"])} for key, state in self._values.items()}
+        
+        lines = []
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                labels = self._labels(key, {"le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{self._labels(key)} {state['count']}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("research_stage_duration_seconds", "Wall time of workflow nodes.", ["stage"])
+CALL_SECONDS = Histogram("research_call_duration_seconds", "Duration of external calls and extraction.", ["kind"])
+CALLS = Counter("research_calls_total", "External calls by outcome (ok, error, fallback).", ["kind", "outcome"])
+FALLBACKS = Counter(
+    "research_mock_fallbacks_total",
+    "Searches and fetches whose failure was silently replaced by mock content.",
+    ["kind"]
+)
+CACHE_REQUESTS = Counter("research_cache_requests_total", "Calls answered from a cache (hit) or not (miss).", ["kind", "result"])
+CACHE_HIT_RATIO = Gauge("research_cache_hit_ratio", "Share of calls answered from a cache since start.", ["kind"])
+IN_FLIGHT = Gauge("research_in_flight", "Nodes and calls currently running.", ["kind"])
+BYTES_DOWNLOADED = Counter("research_fetch_bytes_total", "Bytes downloaded by the page fetcher.")
+TOKENS = Counter("research_llm_tokens_total", "LLM tokens (estimated when not reported).", ["type"])
+RUNS = Counter("research_runs_total", "Completed research runs.")
+RUN_SECONDS = Histogram("research_run_duration_seconds", "Wall time of complete research runs.")
+LOOP_LAG = Histogram("research_event_loop_lag_seconds", "How late the event loop runs a due timer.", buckets=LAG_BUCKETS)
+LOOP_LAG_LAST = Gauge("research_event_loop_lag_last_seconds", "Most recent event-loop lag sample.")
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format."""
+    for kind in CACHED_KINDS:
+        hits = CACHE_REQUESTS.value(kind=kind, result="hit")
+        total = hits + CACHE_REQUESTS.value(kind=kind, result="miss")
+        if total:
+            CACHE_HIT_RATIO.set(hits / total, kind=kind)
+    
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def span_started(span):
+    """Called by src.tracing when a span opens."""
+    if not METRICS_ENABLED:
+        return
+    IN_FLIGHT.inc(kind=span.kind)
+    _ensure_lag_probe()
+
+
+def span_finished(span):
+    """Called by src.tracing when a span closes: fold it into the aggregates."""
+    if not METRICS_ENABLED:
+        return
+    IN_FLIGHT.dec(kind=span.kind)
+    attributes = span.attributes
+    
+    if span.kind == "node":
+        STAGE_SECONDS.observe(span.duration, stage=span.name)
+        return
+    
+    CALL_SECONDS.observe(span.duration, kind=span.kind)
+    if span.error:
+        outcome = "error"
+    elif attributes.get("fallback"):
+        outcome = "fallback"
+        FALLBACKS.inc(kind=span.kind)
+    else:
+        outcome = "ok"
+    CALLS.inc(kind=span.kind, outcome=outcome)
+    
+    # Only calls that consulted a cache count towards the hit ratio
+    if span.kind in CACHED_KINDS and attributes.get("cache_lookup"):
+        cache_lookup(span.kind, bool(attributes.get("cache_hit")))
+    if attributes.get("bytes"):
+        BYTES_DOWNLOADED.inc(attributes["bytes"])
+    if attributes.get("prompt_tokens"):
+        TOKENS.inc(attributes["prompt_tokens"], type="prompt")
+    if attributes.get("completion_tokens"):
+        TOKENS.inc(attributes["completion_tokens"], type="completion")
+
+
+def cache_lookup(kind: str, hit: bool):
+    """Count a cache lookup (also for calls a cache made unnecessary, e.g. corpus-answered searches)."""
+    if METRICS_ENABLED:
+        CACHE_REQUESTS.inc(kind=kind, result="hit" if hit else "miss")
+
+
+def run_finished(duration: float):
+    if METRICS_ENABLED:
+        RUNS.inc()
+        RUN_SECONDS.observe(duration)
+
+
+# Running lag probe per event loop, with the hook stopping it at loop shutdown
+_lag_probes: Dict[asyncio.AbstractEventLoop, Tuple[asyncio.Task, Any]] = {}
+
+
+def _ensure_lag_probe():
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if loop in _lag_probes:
+        return
+    
+    task = loop.create_task(_probe_lag(loop))
+    # asyncio.run() cancels leftover tasks itself; the entry goes with the task
+    task.add_done_callback(lambda _: _lag_probes.pop(loop, None))
+    _lag_probes[loop] = (task, close_with_loop(lambda: _stop_lag_probe(task)))
+
+
+async def _stop_lag_probe(task: asyncio.Task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def _probe_lag(loop: asyncio.AbstractEventLoop):
+    """Sample how much later than scheduled the loop wakes a sleeping task."""
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        lag = max(0.0, loop.time() - start - LAG_PROBE_INTERVAL)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[int]:
+    """
+    Serve /metrics on a daemon thread (once per process).
+    
+    Returns the bound port, or None when disabled (port 0) or the port is taken.
+    """
+    global _server
+    if not METRICS_ENABLED or not port:
+        return None
+    
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                if DEBUG:
+                    print(f"[METRICS] Could not listen on {host}:{port}: {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            if DEBUG:
+                print(f"[METRICS] Serving on http://{host}:{port}/metrics")
+        return _server.server_address[1]
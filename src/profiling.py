@@ -0,0 +1,312 @@
+"""
+Profiling for CLI and batch runs (main.py --profile).
+
+A run is profiled in four ways at once:
+- cProfile over the event loop thread (cpu.prof for pstats/snakeviz, cpu.txt)
+- a stack sampler over all threads, written as folded stacks
+  (stacks.folded, for flamegraph.pl or speedscope). Loop-thread samples
+  taken while a node's code is running are also written per node
+  (nodes/<node>.folded). A suspended coroutine is not on the stack, so those
+  are on-CPU samples.
+- asyncio debug mode, logging every callback or task step that blocks the
+  loop longer than the slow-callback threshold (slow_callbacks.txt). Debug
+  mode records a traceback for every task and handle, so expect the run
+  itself to be somewhat slower.
+- optionally tracemalloc, with the top allocation sites per node
+  (memory.txt). Branches running concurrently share the diff, so per-node
+  figures for fan-out nodes are approximate. The snapshots block the loop;
+  their time is reported separately and kept out of the summary.
+"""
+import asyncio
+import cProfile
+import io
+import linecache
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+from src import tracing
+from src.config import REPORTS_DIR
+import src.agent_nodes as nodes
+
+PROFILES_DIR = REPORTS_DIR / "profiles"
+
+# Graph node names (as in src.workflow) by node function
+NODE_FUNCTIONS = {
+    "planning": nodes.planning_node,
+    "speculative_search": nodes.speculative_search_node,
+    "search": nodes.search_node,
+    "fetch": nodes.fetch_node,
+    "research_subtopic": nodes.subtopic_research_node,
+    "merge": nodes.merge_node,
+    "synthesis": nodes.synthesis_node,
+    "output": nodes.output_node,
+}
+
+# Allocations made in these files (imports, the profiler itself) are not counted
+MEMORY_IGNORED = (
+    "<frozen importlib._bootstrap>",
+    "<frozen importlib._bootstrap_external>",
+    tracemalloc.__file__,
+    traceback.__file__,
+    linecache.__file__,
+    __file__,
+)
+
+# Code that only runs to take and compare allocation snapshots; it is left out
+# of the summary's top functions
+SNAPSHOT_FILES = (tracemalloc.__file__, traceback.__file__, linecache.__file__, __file__)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of all threads every `interval` seconds in a background thread."""
+    
+    def __init__(self, interval: float, loop_thread: int):
+        self.interval = interval
+        self.loop_thread = loop_thread
+        self.node_codes = {function.__code__: name for name, function in NODE_FUNCTIONS.items()}
+        self.stacks: Counter = Counter()
+        self.node_stacks: Dict[str, Counter] = defaultdict(Counter)
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                
+                labels = [_frame_label(code) for code in codes]
+                thread = "event-loop" if thread_id == self.loop_thread else names.get(thread_id, str(thread_id))
+                self.stacks[";".join([thread] + labels)] += 1
+                
+                if thread_id == self.loop_thread:
+                    # The innermost node function on the stack owns the sample
+                    for depth in range(len(codes) - 1, -1, -1):
+                        node = self.node_codes.get(codes[depth])
+                        if node is not None:
+                            self.node_stacks[node][";".join(labels[depth:])] += 1
+                            break
+            self.samples += 1
+
+
+class SlowCallbackLog(logging.Handler):
+    """
+    Collects asyncio debug-mode warnings (slow callbacks, unawaited coroutines).
+    
+    With allocation tracking on, loop steps that were only slow because of
+    the snapshots taken in them are counted in `snapshot_slowed` instead.
+    """
+    
+    def __init__(self, threshold: float, memory: Optional["NodeMemoryTracker"] = None):
+        super().__init__(logging.WARNING)
+        self.threshold = threshold
+        self.memory = memory
+        self.messages: List[str] = []
+        self.snapshot_slowed = 0
+    
+    def emit(self, record: logging.LogRecord):
+        message = record.getMessage()
+        # asyncio logs "Executing %s took %.3f seconds" as soon as the step ends
+        if self.memory is not None and str(record.msg).startswith("Executing") and record.args:
+            took = record.args[-1]
+            overhead = self.memory.overhead_since(time.monotonic() - took)
+            if took - overhead < self.threshold:
+                self.snapshot_slowed += 1
+                return
+            if overhead:
+                message += f" ({overhead:.3f}s of it in allocation snapshots)"
+        self.messages.append(message)
+
+
+class NodeMemoryTracker:
+    """
+    Tracing listener diffing tracemalloc snapshots around every node span.
+    
+    Snapshots cover the whole heap and are taken on the event loop, so the
+    time spent on them is recorded (`intervals`) and left out of the report.
+    """
+    
+    def __init__(self, top: int):
+        self.top = top
+        self._snapshots: Dict[str, tracemalloc.Snapshot] = {}
+        self.allocations: Dict[str, Counter] = defaultdict(Counter)
+        self.peaks: Dict[str, int] = {}
+        self.intervals: List[Tuple[float, float]] = []
+    
+    def overhead_since(self, start: float) -> float:
+        """Seconds spent on snapshots since start (a time.monotonic() value)."""
+        return sum(end - max(begin, start) for begin, end in self.intervals if end > start)
+    
+    def span_started(self, span):
+        if span.kind == "node":
+            began = time.monotonic()
+            self._snapshots[span.span_id] = tracemalloc.take_snapshot()
+            self.intervals.append((began, time.monotonic()))
+    
+    def span_finished(self, span):
+        start = self._snapshots.pop(span.span_id, None) if span.kind == "node" else None
+        if start is None:
+            return
+        began = time.monotonic()
+        for stat in tracemalloc.take_snapshot().compare_to(start, "lineno"):
+            frame = stat.traceback[0]
+            if stat.size_diff > 0 and frame.filename not in MEMORY_IGNORED:
+                self.allocations[span.name][f"{frame.filename}:{frame.lineno}"] += stat.size_diff
+        self.peaks[span.name] = max(self.peaks.get(span.name, 0), tracemalloc.get_traced_memory()[1])
+        self.intervals.append((began, time.monotonic()))
+
+
+class Profiler:
+    """
+    Profiles one run. Use as a context manager around asyncio.run(), with the
+    workflow coroutine wrapped in profiler.run() so asyncio debug settings
+    apply to that loop:
+        
+        with Profiler() as profiler:
+            asyncio.run(profiler.run(run_research_once(query)))
+        print(profiler.summary())
+    """
+    
+    def __init__(
+        self,
+        output_dir: Optional[Path] = None,
+        interval: float = 0.005,
+        slow_callback: float = 0.1,
+        memory_top: int = 0
+    ):
+        self.output_dir = Path(output_dir or PROFILES_DIR / datetime.now().strftime("%Y%m%d_%H%M%S"))
+        self.interval = interval
+        self.slow_callback = slow_callback
+        self.memory_top = memory_top
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(interval, threading.get_ident())
+        self.memory: Optional[NodeMemoryTracker] = NodeMemoryTracker(memory_top) if memory_top > 0 else None
+        if self.memory is not None and not tracing.INSTRUMENTED:
+            # Allocations are attributed at node span boundaries
+            print("[PROFILE] Allocation tracking needs TRACING_ENABLED or METRICS_ENABLED; skipping it")
+            self.memory = None
+        self.slow_callbacks = SlowCallbackLog(slow_callback, self.memory)
+        self.elapsed = 0.0
+    
+    def __enter__(self) -> "Profiler":
+        logging.getLogger("asyncio").addHandler(self.slow_callbacks)
+        if self.memory is not None:
+            tracemalloc.start()
+            tracing.listeners.append(self.memory)
+        self.sampler.start()
+        self._started = time.perf_counter()
+        self.profile.enable()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.profile.disable()
+        self.elapsed = time.perf_counter() - self._started
+        self.sampler.stop()
+        if self.memory is not None:
+            tracing.listeners.remove(self.memory)
+            tracemalloc.stop()
+        logging.getLogger("asyncio").removeHandler(self.slow_callbacks)
+        self.write()
+        return False
+    
+    async def run(self, coroutine: Awaitable[Any]) -> Any:
+        """Await coroutine with asyncio debug mode and slow-callback logging on."""
+        loop = asyncio.get_running_loop()
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.slow_callback
+        return await coroutine
+    
+    def write(self):
+        """Write all profile outputs to output_dir."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        self.profile.dump_stats(str(self.output_dir / "cpu.prof"))
+        text = io.StringIO()
+        pstats.Stats(self.profile, stream=text).sort_stats("cumulative").print_stats(40)
+        (self.output_dir / "cpu.txt").write_text(text.getvalue())
+        
+        def folded(stacks: Counter) -> str:
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        
+        (self.output_dir / "stacks.folded").write_text(folded(self.sampler.stacks))
+        nodes_dir = self.output_dir / "nodes"
+        nodes_dir.mkdir(exist_ok=True)
+        for node, stacks in self.sampler.node_stacks.items():
+            (nodes_dir / f"{node}.folded").write_text(folded(stacks))
+        
+        (self.output_dir / "slow_callbacks.txt").write_text("\n".join(self.slow_callbacks.messages) + "\n")
+        
+        if self.memory is not None:
+            lines = []
+            for node, allocations in self.memory.allocations.items():
+                lines.append(f"{node} (peak traced {self.memory.peaks.get(node, 0) / 1024:.0f} KB)")
+                for location, size in allocations.most_common(self.memory_top):
+                    lines.append(f"  {size / 1024:>10.1f} KB  {location}")
+                lines.append("")
+            (self.output_dir / "memory.txt").write_text("\n".join(lines))
+    
+    def summary(self) -> str:
+        """Short text summary of where the run's time went."""
+        lines = [f"Profile written to {self.output_dir} ({self.elapsed:.1f}s, {self.sampler.samples} samples)"]
+        
+        on_cpu = {node: sum(stacks.values()) for node, stacks in self.sampler.node_stacks.items()}
+        if on_cpu and self.sampler.samples:
+            lines.append("Event loop busy in node code (share of samples):")
+            for node, count in sorted(on_cpu.items(), key=lambda item: -item[1]):
+                lines.append(f"  {node:<20} {count / self.sampler.samples:>6.1%}")
+        
+        # Time blocked in the selector is the loop idling, not work. Snapshot
+        # code is the profiler's own, as is the time builtins spend on its behalf
+        stats = pstats.Stats(self.profile)
+        busy = []
+        for (filename, line, name), (_, _, tottime, _, callers) in stats.stats.items():
+            if "of 'select." in name or "_tracemalloc." in name or filename in SNAPSHOT_FILES:
+                continue
+            tottime -= sum(timing[2] for caller, timing in callers.items() if caller[0] in SNAPSHOT_FILES)
+            busy.append((tottime, filename, line, name))
+        top = sorted(busy, reverse=True)[:5]
+        if top:
+            lines.append("Top functions by own time (event loop thread):")
+            for tottime, filename, line, name in top:
+                lines.append(f"  {tottime:>7.3f}s  {name} ({os.path.basename(filename)}:{line})")
+        
+        if self.memory is not None:
+            overhead = sum(end - begin for begin, end in self.memory.intervals)
+            lines.append(f"Allocation snapshots: {overhead:.2f}s on the event loop (excluded below)")
+        
+        slow = [message for message in self.slow_callbacks.messages if message.startswith("Executing")]
+        lines.append(f"Slow callbacks (> {self.slow_callback * 1000:.0f} ms): {len(slow)}")
+        if self.slow_callbacks.snapshot_slowed:
+            lines.append(f"  (plus {self.slow_callbacks.snapshot_slowed} only slow because of allocation snapshots)")
+        for message in slow[:10]:
+            lines.append(f"  {message}")
+        return "\n".join(lines)
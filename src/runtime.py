@@ -0,0 +1,111 @@
+"""Persistent background event loop for driving the async workflow from sync code."""
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, Iterator, Optional
+
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running forever in a daemon thread.
+    
+    Synchronous callers (e.g. the Streamlit script thread) submit work to it
+    instead of calling asyncio.run(), so pooled HTTP/LLM clients and caches
+    bound to the loop stay warm across requests.
+    """
+    
+    def __init__(self, name: str = "research-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the loop and return a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def run(self, coro: Coroutine) -> Any:
+        """Run a coroutine on the loop and block until it finishes."""
+        return self.submit(coro).result()
+    
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """
+        Drive an async generator on the loop, yielding its items in the calling thread.
+        
+        If the caller stops early the generator task is cancelled.
+        """
+        items: queue.Queue = queue.Queue()
+        done = object()
+        
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put(item)
+            except Exception as e:
+                items.put(e)
+            finally:
+                items.put(done)
+        
+        future = self.submit(pump())
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if not future.done():
+                future.cancel()
+    
+    def stop(self):
+        """Cancel outstanding tasks, stop the loop and wait for its thread to exit."""
+        async def cancel_tasks():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        self.run(cancel_tasks())
+        # Lets clients registered with close_with_loop close themselves here
+        self.run(self.loop.shutdown_asyncgens())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+def close_with_loop(close: Callable[[], Awaitable[None]]) -> AsyncIterator:
+    """
+    Await close() on the running loop when that loop shuts down.
+    
+    asyncio.run() and BackgroundLoop.stop() finalise the async generators
+    started on their loop before closing it, so the returned generator's
+    cleanup runs there while connections bound to the loop can still be
+    closed. The loop only holds the generator weakly: keep the returned
+    handle referenced for as long as the resources live.
+    """
+    async def closer():
+        try:
+            yield
+        finally:
+            await close()
+    
+    handle = closer()
+    asyncio.ensure_future(handle.__anext__())
+    return handle
+
+
+def close_on_loop(loop: Optional[asyncio.AbstractEventLoop], close: Callable[[], Awaitable[None]]):
+    """
+    Await close() on loop if it is still running (in another thread).
+    
+    Resources of a loop that has already been shut down were closed by
+    close_with_loop, and a stopped loop cannot run anything.
+    """
+    if loop is not None and loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(close(), loop)
@@ -0,0 +1,113 @@
+"""Strategies for choosing which sources to fetch."""
+import zlib
+from typing import Callable, Dict, List, Sequence
+import numpy as np
+from src.state import Source
+from src.context import tokenize
+from src.config import SOURCE_SELECTION, MMR_LAMBDA
+
+# Dimensionality of the hashed bag-of-words vectors
+VECTOR_DIM = 1024
+
+# Characters of fetched/raw content used next to title and snippet
+VECTOR_CONTENT_CHARS = 1000
+
+
+def hashed_vectors(texts: Sequence[str], dim: int = VECTOR_DIM) -> np.ndarray:
+    """L2-normalised hashed term-frequency vectors (sublinear tf), one row per text."""
+    vectors = np.zeros((len(texts), dim))
+    for row, text in enumerate(texts):
+        for token in tokenize(text):
+            vectors[row, zlib.crc32(token.encode()) % dim] += 1
+    
+    vectors = np.log1p(vectors)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def source_text(source: Source) -> str:
+    """Text a source is compared by."""
+    return f"{source.title}\n{source.snippet}\n{(source.content or '')[:VECTOR_CONTENT_CHARS]}"
+
+
+def select_by_relevance(
+    candidates: List[Source],
+    k: int,
+    query: str,
+    subtopics: Sequence[str],
+    selected: Sequence[Source] = ()
+) -> List[Source]:
+    """The k candidates with the highest provider relevance score."""
+    return sorted(candidates, key=lambda x: x.relevance_score, reverse=True)[:k]
+
+
+def select_mmr(
+    candidates: List[Source],
+    k: int,
+    query: str,
+    subtopics: Sequence[str],
+    selected: Sequence[Source] = ()
+) -> List[Source]:
+    """
+    Maximal-marginal-relevance selection spread across subtopics.
+    
+    Each pick maximises
+        MMR_LAMBDA * relevance + (1 - MMR_LAMBDA) * (coverage gain - redundancy)
+    where relevance blends the provider score with similarity to the query's
+    subtopics, coverage gain is how much the source adds to subtopics not yet
+    covered by the picked sources, and redundancy is its highest similarity
+    to a picked source. Sources in selected (e.g. already fetched) count as
+    picked but are not returned.
+    """
+    if k <= 0 or not candidates:
+        return []
+    
+    topics = [f"{query} {subtopic}" for subtopic in subtopics] or [query]
+    vectors = hashed_vectors([source_text(s) for s in [*candidates, *selected]] + topics)
+    candidate_vectors = vectors[:len(candidates)]
+    selected_vectors = vectors[len(candidates):len(candidates) + len(selected)]
+    topic_vectors = vectors[len(candidates) + len(selected):]
+    
+    topic_sim = candidate_vectors @ topic_vectors.T  # (candidates, topics)
+    scores = np.array([s.relevance_score for s in candidates])
+    relevance = 0.5 * scores / (scores.max() or 1.0) + 0.5 * topic_sim.max(axis=1)
+    
+    # Best similarity of any picked source to each topic / candidate
+    covered = (selected_vectors @ topic_vectors.T).max(axis=0) if len(selected) else np.zeros(len(topics))
+    redundancy = (candidate_vectors @ selected_vectors.T).max(axis=1) if len(selected) else np.zeros(len(candidates))
+    
+    available = np.ones(len(candidates), dtype=bool)
+    picks = []
+    
+    for _ in range(min(k, len(candidates))):
+        gain = np.clip(topic_sim - covered, 0, None).mean(axis=1)
+        objective = MMR_LAMBDA * relevance + (1 - MMR_LAMBDA) * (gain - redundancy)
+        objective[~available] = -np.inf
+        
+        best = int(np.argmax(objective))
+        picks.append(best)
+        available[best] = False
+        covered = np.maximum(covered, topic_sim[best])
+        redundancy = np.maximum(redundancy, candidate_vectors @ candidate_vectors[best])
+    
+    return [candidates[i] for i in picks]
+
+
+SELECTION_STRATEGIES: Dict[str, Callable[..., List[Source]]] = {
+    "relevance": select_by_relevance,
+    "mmr": select_mmr,
+}
+
+
+def select_sources(
+    candidates: List[Source],
+    k: int,
+    query: str,
+    subtopics: Sequence[str],
+    selected: Sequence[Source] = (),
+    strategy: str = SOURCE_SELECTION
+) -> List[Source]:
+    """Pick up to k candidates to fetch with the configured strategy."""
+    if strategy not in SELECTION_STRATEGIES:
+        raise ValueError(f"Unknown source selection strategy: {strategy}")
+    return SELECTION_STRATEGIES[strategy](candidates, k, query, subtopics, selected)
@@ -1,5 +1,7 @@
 """State definitions for the Research Assistant Agent."""
-from typing import List, Dict, Optional
+import operator
+import uuid
+from typing import Annotated, List, Dict, Optional
 from pydantic import BaseModel, Field
 
 
@@ -10,6 +12,7 @@ class Source(BaseModel):
     snippet: str
     content: Optional[str] = None
     relevance_score: float = 0.0
+    subtopic: Optional[str] = None  # Subtopic whose search found the source
 
 
 class ResearchState(BaseModel):
@@ -23,10 +26,16 @@ class ResearchState(BaseModel):
     search_strategy: str = Field(default="", description="Planned search approach")
     
     # Execution phase
-    search_queries: List[str] = Field(default_factory=list, description="Generated search queries")
+    search_queries: Annotated[List[str], operator.add] = Field(default_factory=list, description="Generated search queries")
     sources: List[Source] = Field(default_factory=list, description="Found sources")
     fetched_content: List[Dict] = Field(default_factory=list, description="Full article content")
     
+    # Per-subtopic fan-out (branches append, the merge step reads)
+    subtopic: Optional[str] = Field(default=None, description="Subtopic handled by a fan-out branch")
+    prefetched: int = Field(default=0, description="Fetches the speculative search takes from the branches' budget")
+    branch_sources: Annotated[List[Source], operator.add] = Field(default_factory=list, description="Sources found by branches")
+    branch_fetched: Annotated[List[Dict], operator.add] = Field(default_factory=list, description="Content fetched by branches")
+    
     # Synthesis phase
     synthesized_report: str = Field(default="", description="Final research report")
     citations: List[str] = Field(default_factory=list, description="Formatted citations")
@@ -35,7 +44,9 @@ class ResearchState(BaseModel):
     output_path: Optional[str] = Field(default=None, description="Saved report path")
     
     # Metadata
-    errors: List[str] = Field(default_factory=list, description="Any errors encountered")
+    run_id: str = Field(default_factory=lambda: uuid.uuid4().hex, description="Identifies the run's trace")
+    trace: Optional[Dict] = Field(default=None, description="Timings, tokens and bytes of the run (see src.tracing)")
+    errors: Annotated[List[str], operator.add] = Field(default_factory=list, description="Any errors encountered")
     current_step: str = Field(default="init", description="Current workflow step")
     
     class Config:
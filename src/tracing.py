@@ -0,0 +1,332 @@
+"""
+Per-run tracing: spans for graph nodes and external calls (search, fetch, LLM).
+
+Finished spans also feed the process-wide metrics in src.metrics; with
+tracing off but metrics on, spans are still timed but belong to no trace.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from src import metrics
+from src.config import TRACING_ENABLED, TRACE_EXPORT_DIR, METRICS_ENABLED, DEBUG
+
+# Whether nodes and calls are instrumented at all
+INSTRUMENTED = TRACING_ENABLED or METRICS_ENABLED
+
+# Unfinished traces kept at once (runs that fail never finish theirs)
+MAX_OPEN_TRACES = 100
+
+# Attributes summed over all spans of a run
+COUNTERS = ("bytes", "prompt_tokens", "completion_tokens", "queue_wait")
+
+
+class Span:
+    """One timed operation within a run."""
+    
+    __slots__ = ("name", "kind", "span_id", "parent_id", "start", "end", "attributes", "error")
+    
+    def __init__(self, name: str, kind: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes = dict(attributes)
+        self.error: Optional[str] = None
+    
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+    
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+    
+    def add(self, name: str, amount: float):
+        self.attributes[name] = self.attributes.get(name, 0) + amount
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": round(self.duration, 6),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NullSpan:
+    """Stand-in span for calls made outside a traced run."""
+    
+    def set(self, **attributes: Any):
+        pass
+    
+    def add(self, name: str, amount: float):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """All spans of one research run."""
+    
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+    
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Totals for the run.
+        
+        Node times are wall-clock from the first to the last span of that
+        node, so fan-out branches running in parallel are not added up.
+        """
+        end = self.end or time.time()
+        with self._lock:
+            spans = list(self.spans)
+        
+        nodes: Dict[str, Dict[str, Any]] = {}
+        calls: Dict[str, Dict[str, Any]] = {}
+        totals = dict.fromkeys(COUNTERS, 0)
+        
+        for span in spans:
+            if span.kind == "node":
+                node = nodes.setdefault(span.name, {"start": span.start, "end": span.start, "count": 0})
+                node["start"] = min(node["start"], span.start)
+                node["end"] = max(node["end"], span.end or end)
+                node["count"] += 1
+            else:
+                call = calls.setdefault(span.kind, {"count": 0, "seconds": 0.0, "cache_hits": 0, "errors": 0})
+                call["count"] += 1
+                call["seconds"] += span.duration
+                call["cache_hits"] += bool(span.attributes.get("cache_hit"))
+                call["errors"] += span.error is not None
+            for counter in COUNTERS:
+                totals[counter] += span.attributes.get(counter, 0)
+        
+        return {
+            "run_id": self.run_id,
+            "duration": round(end - self.start, 3),
+            "nodes": {
+                name: {"seconds": round(node["end"] - node["start"], 3), "count": node["count"]}
+                for name, node in sorted(nodes.items(), key=lambda item: item[1]["start"])
+            },
+            "calls": {
+                kind: {**call, "seconds": round(call["seconds"], 3)}
+                for kind, call in calls.items()
+            },
+            "bytes_downloaded": totals["bytes"],
+            "prompt_tokens": totals["prompt_tokens"],
+            "completion_tokens": totals["completion_tokens"],
+            "queue_wait": round(totals["queue_wait"], 3),
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {"summary": self.summary(), "spans": spans}
+    
+    def to_otlp(self) -> Dict[str, Any]:
+        """The trace as OpenTelemetry (OTLP/JSON) resource spans."""
+        def value(v: Any) -> Dict[str, Any]:
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+        
+        def nanos(t: float) -> str:
+            return str(int(t * 1e9))
+        
+        with self._lock:
+            spans = list(self.spans)
+        
+        otlp_spans = []
+        for span in spans:
+            attributes = {"research.kind": span.kind, **span.attributes}
+            otlp_span = {
+                "traceId": self.run_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1 if span.kind == "node" else 3,  # INTERNAL / CLIENT
+                "startTimeUnixNano": nanos(span.start),
+                "endTimeUnixNano": nanos(span.end or self.end or time.time()),
+                "attributes": [{"key": k, "value": value(v)} for k, v in attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            otlp_spans.append(otlp_span)
+        
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "research-agent"}}]},
+                "scopeSpans": [{"scope": {"name": "src.tracing"}, "spans": otlp_spans}],
+            }]
+        }
+
+
+# Traces of runs in progress, by run_id
+_traces: "OrderedDict[str, Trace]" = OrderedDict()
+_traces_lock = threading.Lock()
+
+# Objects notified as spans open and close (span_started/span_finished);
+# the metrics module by default, the profiler while it runs
+listeners: List[Any] = [metrics]
+
+# (trace, span) the running code belongs to; asyncio tasks inherit it, so
+# calls made from a node (and tasks it spawns) land under that node's span
+_current: contextvars.ContextVar = contextvars.ContextVar("research_span", default=None)
+
+
+def get_trace(run_id: str) -> Trace:
+    """The trace for run_id, started on first use."""
+    with _traces_lock:
+        trace = _traces.get(run_id)
+        if trace is None:
+            trace = _traces[run_id] = Trace(run_id)
+            while len(_traces) > MAX_OPEN_TRACES:
+                _traces.popitem(last=False)
+        return trace
+
+
+def finish_trace(run_id: str) -> Optional[Dict[str, Any]]:
+    """End a run's trace, export it if configured, and return it as a dict."""
+    with _traces_lock:
+        trace = _traces.pop(run_id, None)
+    if trace is None:
+        return None
+    
+    trace.end = time.time()
+    metrics.run_finished(trace.end - trace.start)
+    if TRACE_EXPORT_DIR:
+        try:
+            path = Path(TRACE_EXPORT_DIR) / f"{run_id}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(trace.to_otlp()))
+        except OSError as e:
+            if DEBUG:
+                print(f"[TRACE] Could not export trace: {e}")
+    return trace.to_dict()
+
+
+def _open(trace: Optional[Trace], parent: Optional[Span], name: str, kind: str, attributes: Dict[str, Any]) -> Span:
+    opened = Span(name, kind, parent.span_id if parent else None, attributes)
+    if trace is not None:
+        trace.add(opened)
+    for listener in listeners:
+        listener.span_started(opened)
+    return opened
+
+
+def close_span(closing: Span):
+    """End a span opened with detached_span."""
+    closing.end = time.time()
+    for listener in listeners:
+        listener.span_finished(closing)
+
+
+@contextmanager
+def _activate(trace: Optional[Trace], active: Span) -> Iterator[Span]:
+    token = _current.set((trace, active))
+    try:
+        yield active
+    except BaseException as e:
+        active.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        close_span(active)
+        _current.reset(token)
+
+
+def span(name: str, kind: Optional[str] = None, **attributes: Any):
+    """
+    Context manager timing a block as a child of the current span (kind
+    defaults to the name, e.g. "search", "fetch", "llm").
+    
+    Outside a traced run the span belongs to no trace and only feeds the
+    metrics; with metrics disabled too it is a no-op.
+    """
+    trace, parent = _current.get() or (None, None)
+    if parent is None and not METRICS_ENABLED:
+        return nullcontext(NULL_SPAN)
+    return _activate(trace, _open(trace, parent, name, kind or name, attributes))
+
+
+def current_span() -> Any:
+    """The innermost open span, or a no-op span."""
+    current = _current.get()
+    return current[1] if current is not None else NULL_SPAN
+
+
+def detached_span(name: str, kind: Optional[str] = None, **attributes: Any) -> Optional[Span]:
+    """
+    Open a child of the current span without making it current.
+    
+    For work spread over several resumptions of an async generator, where a
+    context variable cannot be held across yields; end it with close_span.
+    Returns None when span() would be a no-op.
+    """
+    trace, parent = _current.get() or (None, None)
+    if parent is None and not METRICS_ENABLED:
+        return None
+    return _open(trace, parent, name, kind or name, attributes)
+
+
+def traced_node(name: str, node, final: bool = False):
+    """
+    Wrap a graph node so it runs inside a span of its run's trace.
+    
+    The final node also ends the trace and adds it to its state update.
+    """
+    if not INSTRUMENTED:
+        return node
+    
+    @functools.wraps(node)
+    async def run(state) -> Dict[str, Any]:
+        trace = get_trace(state.run_id) if TRACING_ENABLED else None
+        with _activate(trace, _open(trace, None, name, "node", {})):
+            update = await node(state)
+        if final and trace is not None:
+            update = {**update, "trace": finish_trace(state.run_id)}
+        return update
+    
+    return run
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """Plain-text run summary (for the CLI)."""
+    lines = [f"Duration: {summary['duration']:.1f}s"]
+    for name, node in summary["nodes"].items():
+        count = f" x{node['count']}" if node["count"] > 1 else ""
+        lines.append(f"  {name:<20} {node['seconds']:>7.2f}s{count}")
+    for kind, call in summary["calls"].items():
+        lines.append(
+            f"{kind.upper()} calls: {call['count']} ({call['seconds']:.1f}s total, "
+            f"{call['cache_hits']} cached, {call['errors']} failed)"
+        )
+    lines.append(
+        f"Tokens: {summary['prompt_tokens']} prompt / {summary['completion_tokens']} completion"
+    )
+    lines.append(f"Downloaded: {summary['bytes_downloaded'] / 1024:.0f} KB, queue wait {summary['queue_wait']:.2f}s")
+    return "\n".join(lines)
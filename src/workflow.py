@@ -1,38 +1,103 @@
 """LangGraph workflow for the Research Assistant Agent."""
-from langgraph.graph import StateGraph, END
+from typing import Any, AsyncIterator, List, Tuple
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 from src.state import ResearchState
+from src.llm import message_text
+from src.config import PIPELINE_SUBTOPICS, SPECULATIVE_SEARCH
+from src.tracing import traced_node
 from src.agent_nodes import (
     planning_node,
     search_node,
     fetch_node,
+    subtopic_research_node,
+    speculative_search_node,
+    merge_node,
     synthesis_node,
-    output_node
+    output_node,
+    REPORT_STREAM_TAG,
+    SPECULATIVE_FETCH_COUNT
 )
 
 
-def create_research_workflow():
+def route_subtopics(state: ResearchState, prefetched: int = 0) -> List[Send]:
+    """
+    Start one research branch per subtopic (or one for the raw query).
+    
+    prefetched is the part of the fetch budget already spent elsewhere (by
+    the speculative search), which the branches leave out of their split.
+    """
+    subtopics = state.subtopics or [""]
+    return [
+        Send("research_subtopic", ResearchState(
+            query=state.query,
+            subtopics=state.subtopics,
+            subtopic=subtopic,
+            prefetched=prefetched,
+            run_id=state.run_id
+        ))
+        for subtopic in subtopics
+    ]
+
+
+def create_research_workflow(pipelined: bool = PIPELINE_SUBTOPICS, speculative: bool = SPECULATIVE_SEARCH):
     """
     Create and compile the research agent workflow.
     
-    Workflow:
+    Workflow (pipelined):
+    START → Planning → [Search → Fetch per subtopic] → Merge → Synthesis → Output → END
+    
+    Workflow (linear):
     START → Planning → Search → Fetch → Synthesis → Output → END
+    
+    With speculative=True a search on the raw query runs alongside Planning
+    and its results are merged with the subtopic searches.
+    
+    Every node runs inside a span of the run's trace, which the output node
+    attaches to the final state (see src.tracing).
     """
     
     # Initialize graph with ResearchState
     workflow = StateGraph(ResearchState)
     
     # Add nodes
-    workflow.add_node("planning", planning_node)
-    workflow.add_node("search", search_node)
-    workflow.add_node("fetch", fetch_node)
-    workflow.add_node("synthesis", synthesis_node)
-    workflow.add_node("output", output_node)
+    workflow.add_node("planning", traced_node("planning", planning_node))
+    workflow.add_node("synthesis", traced_node("synthesis", synthesis_node))
+    workflow.add_node("output", traced_node("output", output_node, final=True))
     
     # Define edges (workflow flow)
-    workflow.set_entry_point("planning")
-    workflow.add_edge("planning", "search")
-    workflow.add_edge("search", "fetch")
-    workflow.add_edge("fetch", "synthesis")
+    workflow.add_edge(START, "planning")
+    
+    if speculative:
+        workflow.add_node("speculative_search", traced_node("speculative_search", speculative_search_node))
+        workflow.add_edge(START, "speculative_search")
+    
+    if pipelined:
+        # Each subtopic branch starts fetching as soon as its own search returns
+        workflow.add_node("research_subtopic", traced_node("research_subtopic", subtopic_research_node))
+        workflow.add_node("merge", traced_node("merge", merge_node))
+        # The speculative search may still be fetching, so its share is reserved up front
+        prefetched = SPECULATIVE_FETCH_COUNT if speculative else 0
+        workflow.add_conditional_edges(
+            "planning",
+            lambda state: route_subtopics(state, prefetched),
+            ["research_subtopic"]
+        )
+        if speculative:
+            workflow.add_edge(["research_subtopic", "speculative_search"], "merge")
+        else:
+            workflow.add_edge("research_subtopic", "merge")
+        workflow.add_edge("merge", "synthesis")
+    else:
+        workflow.add_node("search", traced_node("search", search_node))
+        workflow.add_node("fetch", traced_node("fetch", fetch_node))
+        if speculative:
+            workflow.add_edge(["planning", "speculative_search"], "search")
+        else:
+            workflow.add_edge("planning", "search")
+        workflow.add_edge("search", "fetch")
+        workflow.add_edge("fetch", "synthesis")
+    
     workflow.add_edge("synthesis", "output")
     workflow.add_edge("output", END)
     
@@ -44,3 +109,33 @@ def create_research_workflow():
 
 # Create the compiled workflow (singleton)
 research_agent = create_research_workflow()
+
+
+async def stream_research(initial_state: ResearchState) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Run the workflow and yield progress events as they happen.
+    
+    Events:
+        ("update", node_name)  - a node finished
+        ("token", text)        - a chunk of the synthesized report
+        ("final", state)       - the final state, same as research_agent.ainvoke()
+    """
+    final_state = None
+    
+    async for mode, payload in research_agent.astream(
+        initial_state,
+        stream_mode=["updates", "messages", "values"]
+    ):
+        if mode == "messages":
+            chunk, metadata = payload
+            if REPORT_STREAM_TAG in metadata.get("tags", []):
+                text = message_text(chunk.content)
+                if text:
+                    yield "token", text
+        elif mode == "updates":
+            for node_name in payload:
+                yield "update", node_name
+        elif mode == "values":
+            final_state = payload
+    
+    yield "final", final_state
@@ -0,0 +1,124 @@
+"""Checks for the search and page caches: query keys, the SQLite store, HTTP freshness and revalidation."""
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+import httpx
+from src.cache import SQLiteCache
+from src.mcp_tools import MCPWebFetch, normalize_query, web_fetch
+from src.config import PAGE_CACHE_DEFAULT_TTL
+
+
+def test_normalize_query_collisions():
+    """Only case, whitespace and trailing punctuation are folded."""
+    assert len({normalize_query(q) for q in ("C++ tutorial", "C# tutorial", "C tutorial")}) == 3
+    assert normalize_query("migrate python to java") != normalize_query("migrate java to python")
+    assert normalize_query("new new york") != normalize_query("new york")
+    assert normalize_query("  What is  .NET? ") == normalize_query("what is .net")
+
+
+def test_sqlite_cache_round_trip_and_expiry():
+    """Values survive a reopen as JSON; expired entries are misses unless stale ones are asked for."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "cache.sqlite3"
+        cache = SQLiteCache(path, ttl=60, max_entries=10)
+        cache.set("results", [{"url": "https://example.com", "score": 0.5}])
+        cache.set("old", "stale value", ttl=-1)
+        cache.close()
+        
+        cache = SQLiteCache(path, ttl=60, max_entries=10)
+        assert cache.get("results") == [{"url": "https://example.com", "score": 0.5}]
+        assert cache.get("old") is None
+        assert cache.get("missing") is None
+        assert not cache.contains("old")
+        
+        stale = cache.get_entry("old", allow_stale=True)
+        assert stale.value == "stale value" and not stale.fresh
+        
+        cache.refresh("old", ttl=60)
+        assert cache.get("old") == "stale value"
+        cache.delete("old")
+        assert cache.get_entry("old", allow_stale=True) is None
+        
+        assert cache.stats()["hits"] == 2
+        cache.close()
+
+
+def test_sqlite_cache_evicts_least_recently_used():
+    """Past max_entries the entries read or written longest ago go first."""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SQLiteCache(Path(directory) / "cache.sqlite3", ttl=60, max_entries=3)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+            time.sleep(0.01)
+        
+        # Reading "a" makes "b" the least recently used entry
+        assert cache.get("a") == "a"
+        time.sleep(0.01)
+        cache.set("d", "d")
+        
+        assert cache.get("b") is None
+        assert [cache.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+        assert cache.stats()["entries"] == 3
+        cache.close()
+
+
+def lifetime(**headers):
+    return web_fetch._freshness_lifetime(httpx.Headers({k.replace("_", "-"): v for k, v in headers.items()}))
+
+
+def test_cache_control_parsing():
+    assert lifetime(cache_control="max-age=600") == 600
+    assert lifetime(cache_control='public, s-maxage="120", max-age=600') == 120
+    assert lifetime(cache_control="max-age=600", age="100") == 500
+    assert lifetime(cache_control="max-age=60", age="100") == 0
+    assert lifetime(cache_control="no-cache") == 0
+    assert lifetime(cache_control="no-store, max-age=600") is None
+    assert lifetime() == PAGE_CACHE_DEFAULT_TTL
+
+
+def test_expires_parsing():
+    date = "Thu, 01 Jan 2026 00:00:00 GMT"
+    assert lifetime(expires="Thu, 01 Jan 2026 01:00:00 GMT", date=date) == 3600
+    assert lifetime(expires="Thu, 01 Jan 2026 01:00:00 GMT", date=date, age="600") == 3000
+    assert lifetime(expires="Wed, 31 Dec 2025 23:00:00 GMT", date=date) == 0
+    assert lifetime(expires="0") == 0
+    # max-age wins over Expires
+    assert lifetime(cache_control="max-age=10", expires="Thu, 01 Jan 2026 01:00:00 GMT", date=date) == 10
+
+
+def test_revalidation_keeps_page_and_stores_new_validators():
+    """A 304 answers from the cached copy and its validators are sent next time."""
+    requests = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.headers.get("if-none-match"))
+        if "if-none-match" in request.headers:
+            return httpx.Response(304, headers={"etag": '"v2"', "cache-control": "max-age=0"})
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/plain", "etag": '"v1"', "cache-control": "max-age=0"},
+            text="hello page"
+        )
+    
+    async def fetch_three_times(fetcher: MCPWebFetch):
+        try:
+            return [await fetcher.fetch("https://example.com/page") for _ in range(3)]
+        finally:
+            await fetcher.aclose()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        fetcher = MCPWebFetch()
+        fetcher.cache = SQLiteCache(Path(directory) / "pages.sqlite3", ttl=60, max_entries=10)
+        fetcher.transport = httpx.MockTransport(handler)
+        
+        assert asyncio.run(fetch_three_times(fetcher)) == ["hello page"] * 3
+        assert requests == [None, '"v1"', '"v2"']
+        fetcher.cache.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
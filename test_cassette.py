@@ -0,0 +1,113 @@
+"""Checks for cassette record/replay: exchanges come back in order and a replayed run matches its recording."""
+import asyncio
+import gzip
+import itertools
+import tempfile
+from pathlib import Path
+import httpx
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+import src.llm as llm_module
+from src.cassette import Cassette, CassetteMiss, cassette
+from src.config import CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY_SCALE
+from src.mcp_tools import web_fetch
+from src.state import ResearchState
+from src.workflow import stream_research
+
+PLAN = "SUBTOPICS:\n1. protocol design\n2. tool servers\n\nSEARCH STRATEGY:\nCompare specifications with deployments."
+REPORT = (
+    "## Executive Summary\nServers expose tools over a shared protocol [Source 1].\n\n"
+    "## Conclusion\nAdoption depends on tooling [Source 2]."
+)
+
+
+async def never_called():
+    raise AssertionError("replay must not run the call")
+
+
+def test_replay_returns_recordings_in_order():
+    """Repeated keys replay in recording order, the last one repeating; misses are reported."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "cassette.jsonl.gz"
+        recorder = Cassette(path, "record")
+        answers = iter(["first", "second"])
+        
+        async def answer():
+            return next(answers)
+        
+        async def record_twice():
+            return [await recorder.through("search", "query", answer) for _ in range(2)]
+        
+        assert asyncio.run(record_twice()) == ["first", "second"]
+        
+        # A process killed mid-write leaves a truncated gzip member behind
+        member = gzip.compress(b'{"kind": "search", "key": "query", "elapsed": 0.1, "value": "third"}\n')
+        with open(path, "ab") as f:
+            f.write(member[:len(member) // 2])
+        
+        player = Cassette(path, "replay")
+        
+        async def replay():
+            return [await player.through("search", "query", never_called) for _ in range(3)]
+        
+        assert asyncio.run(replay()) == ["first", "second", "second"]
+        assert asyncio.run(player.through("fetch", "missing", never_called, miss=lambda: "placeholder")) == "placeholder"
+        try:
+            asyncio.run(player.through("fetch", "missing", never_called))
+        except CassetteMiss:
+            pass
+        else:
+            raise AssertionError("a miss without a fallback must raise CassetteMiss")
+
+
+def test_replayed_run_matches_recording():
+    """A whole workflow run replays to the same report and token stream without any provider."""
+    def fake_model(temperature: float = 0.7, **options):
+        text = PLAN if temperature < 0.5 else REPORT
+        return GenericFakeChatModel(messages=itertools.repeat(AIMessage(content=text)))
+    
+    def page(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"content-type": "text/plain"}, text=f"Article text served for {request.url}.")
+    
+    def refuse(*args, **kwargs):
+        raise AssertionError("replay must not reach a provider")
+    
+    async def run():
+        tokens, final = [], None
+        try:
+            async for kind, payload in stream_research(ResearchState(query="How do MCP tool servers work?")):
+                if kind == "token":
+                    tokens.append(payload)
+                elif kind == "final":
+                    final = payload
+        finally:
+            await web_fetch.aclose()
+        return tokens, final["synthesized_report"], [source.url for source in final["sources"]], final["citations"]
+    
+    get_client = llm_module.llm_clients.get
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "cassette.jsonl.gz"
+        try:
+            cassette.__init__(path, "record")
+            llm_module.llm_clients.get = fake_model
+            web_fetch.transport = httpx.MockTransport(page)
+            recorded = asyncio.run(run())
+            
+            cassette.__init__(path, "replay")
+            llm_module.llm_clients.get = refuse
+            web_fetch.transport = httpx.MockTransport(refuse)
+            replayed = asyncio.run(run())
+        finally:
+            cassette.__init__(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY_SCALE)
+            llm_module.llm_clients.get = get_client
+            web_fetch.transport = None
+    
+    assert recorded[0], "the report should have been streamed"
+    assert replayed == recorded
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,60 @@
+"""Checks for synthesis context packing: chunking and the token budget."""
+from src.context import chunk_text, estimate_tokens, pack_context
+from src.state import Source
+
+
+def paragraph(topic: str, n: int) -> str:
+    return (
+        f"Paragraph {n} on {topic}: measurements of {topic} in recent studies show steady gains, "
+        f"and engineers report that {topic} improves when cells are cycled slowly at moderate temperature."
+    )
+
+
+def source(url: str, score: float, content: str) -> Source:
+    return Source(url=url, title=url, snippet="", content=content, relevance_score=score)
+
+
+LONG = source("https://example.com/long", 0.9, "\n\n".join(paragraph("battery chemistry", n) for n in range(40)))
+SHORT = source("https://example.com/short", 0.5, paragraph("solid state electrolytes", 0))
+NAVIGATION = source("https://example.com/nav", 0.7, "Home | About us | Careers | Contact | Newsletter sign-up | Privacy")
+
+
+def test_chunks_keep_all_text_in_order():
+    """Chunks stay near the target size and together hold the whole text."""
+    chunks = chunk_text(LONG.content, target_chars=600)
+    assert all(len(chunk) <= 1200 for chunk in chunks)
+    assert " ".join(chunks).split() == LONG.content.split()
+
+
+def test_pack_context_stays_within_budget():
+    """The packed chunks fit the budget, and a long article cannot crowd out the others."""
+    budget = 400
+    packed = pack_context([LONG, SHORT, NAVIGATION], ["battery chemistry", "solid state electrolytes"], budget)
+    
+    assert sum(estimate_tokens(chunk) for _, chunks in packed for chunk in chunks) <= budget
+    indexes = [index for index, _ in packed]
+    # Every source gets its best chunk, the long one only part of its text
+    assert indexes == [0, 1, 2]
+    assert len(packed[0][1]) < len(chunk_text(LONG.content))
+    # Chunks stay in document order
+    long_chunks = chunk_text(LONG.content)
+    positions = [long_chunks.index(chunk) for chunk in packed[0][1]]
+    assert positions == sorted(positions)
+
+
+def test_pack_context_leaves_out_unrelated_chunks():
+    """With room to spare, chunks sharing no term with the query are still left out."""
+    footer = " ".join(["Home | About us | Careers | Contact | Newsletter sign-up | Privacy | Terms"] * 8)
+    mixed = source("https://example.com/mixed", 0.8, paragraph("solid state electrolytes", 1) + "\n\n" + footer)
+    assert len(chunk_text(mixed.content)) == 2
+    
+    packed = dict(pack_context([SHORT, mixed], ["solid state electrolytes"], 10_000))
+    assert packed == {0: [SHORT.content], 1: [paragraph("solid state electrolytes", 1)]}
+    assert pack_context([LONG], ["battery chemistry"], 0) == []
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
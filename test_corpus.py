@@ -0,0 +1,77 @@
+"""Checks for the local corpus: strong matches only, eviction, and mixing local hits with web results."""
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+import src.agent_nodes as nodes
+from src.corpus import LocalCorpus
+from src.state import Source
+from src.config import CORPUS_SCORE_WEIGHT
+
+
+def article(topic: str) -> str:
+    return " ".join(
+        f"Section {n} explains how {topic} is measured, why {topic} varies between installations, "
+        f"and which trade-offs engineers accept when tuning {topic} for production workloads."
+        for n in range(5)
+    )
+
+
+def test_search_returns_strong_matches_only():
+    """Documents must contain most query terms; short ones are never stored."""
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = LocalCorpus(Path(directory) / "corpus.sqlite3", vectors=False)
+        corpus.add("https://example.com/latency", "Queue latency", article("queue latency"))
+        corpus.add("https://example.com/power", "Solar power", article("solar power"))
+        corpus.add("https://example.com/stub", "Queue latency stub", "queue latency")
+        assert corpus.count() == 2
+        
+        matches = corpus.search("queue latency tuning", 5)
+        assert [match.url for match in matches] == ["https://example.com/latency"]
+        assert matches[0].relevance_score == 1.0
+        # Two of four terms is below CORPUS_MIN_COVERAGE
+        assert corpus.search("queue latency for spacecraft batteries", 5) == []
+        corpus.close()
+
+
+def test_add_replaces_and_evicts_oldest():
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = LocalCorpus(Path(directory) / "corpus.sqlite3", max_documents=2, vectors=True)
+        for topic in ("queue latency", "solar power", "wind turbines"):
+            corpus.add(f"https://example.com/{topic.replace(' ', '-')}", topic, article(topic))
+            time.sleep(0.01)
+        corpus.add("https://example.com/wind-turbines", "wind turbines", article("wind turbines"))
+        
+        assert corpus.count() == 2
+        assert corpus.search("queue latency", 5) == []
+        assert [match.url for match in corpus.search("wind turbines", 5)] == ["https://example.com/wind-turbines"]
+        corpus.close()
+
+
+def test_local_matches_rank_below_the_best_web_result():
+    """Local scores are rescaled under the best web score, and web results stay in."""
+    class WebSearch:
+        async def search(self, query: str, max_results: int = 10):
+            return [Source(url="https://news.example/latency", title="News", snippet="", content="", relevance_score=0.5)]
+    
+    corpus, web_search = nodes.corpus, nodes.web_search
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            nodes.corpus = LocalCorpus(Path(directory) / "corpus.sqlite3", vectors=False)
+            nodes.web_search = WebSearch()
+            nodes.corpus.add("https://example.com/latency", "Queue latency", article("queue latency"))
+            
+            sources = asyncio.run(nodes.search_sources("queue latency tuning", 3))
+            nodes.corpus.close()
+        finally:
+            nodes.corpus, nodes.web_search = corpus, web_search
+    
+    assert [source.url for source in sources] == ["https://example.com/latency", "https://news.example/latency"]
+    assert sources[0].relevance_score == CORPUS_SCORE_WEIGHT * 0.5
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,88 @@
+"""Checks for duplicate detection: URL canonicalisation, SimHash and source merging."""
+from src.dedup import canonical_url, simhash, hamming_distance, dedupe_sources, group_duplicates
+from src.state import Source
+from src.config import DEDUP_SIMHASH_DISTANCE
+
+
+ARTICLE = (
+    "State space models such as Mamba process sequences in linear time, while transformers "
+    "compare every token with every other token. Recent hybrids interleave attention layers "
+    "with state space layers to keep long context cheap without losing recall on retrieval tasks."
+)
+
+
+def test_canonical_url_variants():
+    """Tracking parameters, mirror hosts and cosmetic differences map to one URL."""
+    canonical = canonical_url("https://example.com/news/story")
+    variants = [
+        "http://www.example.com/news/story/",
+        "https://m.example.com/news/story?utm_source=twitter&utm_medium=social",
+        "https://amp.example.com/news/story/amp",
+        "https://example.com/news/story?ref=homepage#comments",
+        "https://example.com:443/news/story?fbclid=abc123",
+        "https://www-example-com.cdn.ampproject.org/c/s/www.example.com/news/story",
+    ]
+    for url in variants:
+        assert canonical_url(url) == canonical, url
+
+
+def test_canonical_url_keeps_meaningful_differences():
+    """Real query parameters, paths and hosts still tell pages apart."""
+    assert canonical_url("https://example.com/a?b=2&a=1") == canonical_url("https://example.com/a?a=1&b=2")
+    assert canonical_url("https://example.com/a?id=1") != canonical_url("https://example.com/a?id=2")
+    assert canonical_url("https://example.com/a") != canonical_url("https://example.com/b")
+    assert canonical_url("https://example.com/a") != canonical_url("https://example.org/a")
+    # "m." is only a mirror prefix when something is left of the domain
+    assert canonical_url("https://m.com/a") == "https://m.com/a"
+
+
+def test_simhash_near_and_far():
+    """A copy with a footer added counts as a duplicate; unrelated text is far away."""
+    original = simhash(ARTICLE)
+    syndicated = simhash(ARTICLE + " Copyright 2026.")
+    unrelated = simhash(
+        "Boil a large pot of salted water, add the pasta and stir occasionally. Cook until al dente, "
+        "reserve a cup of the cooking water, drain and toss with the sauce before serving hot."
+    )
+    assert hamming_distance(original, original) == 0
+    assert hamming_distance(original, syndicated) <= DEDUP_SIMHASH_DISTANCE
+    assert hamming_distance(original, unrelated) > DEDUP_SIMHASH_DISTANCE * 2
+    assert simhash("too short to fingerprint") is None
+
+
+def source(url: str, score: float, content: str = "", snippet: str = "") -> Source:
+    return Source(url=url, title=url, snippet=snippet, content=content, relevance_score=score)
+
+
+def test_group_duplicates_merges_url_variants_and_copies():
+    """URL variants and syndicated copies join the most relevant member's group."""
+    original = source("https://example.com/story", 0.6, ARTICLE)
+    tracked = source("https://www.example.com/story/?utm_source=feed", 0.9)
+    syndicated = source("https://mirror.example.org/reprint", 0.4, ARTICLE + " Copyright 2026.")
+    other = source("https://example.com/pasta", 0.8, "Boil the pasta in salted water until al dente, then drain it and toss it with the sauce.")
+    
+    groups = group_duplicates([original, tracked, syndicated, other])
+    
+    assert [(rep.url, sorted(d.url for d in dups)) for rep, dups in groups] == [
+        (tracked.url, sorted([original.url, syndicated.url])),
+        (other.url, []),
+    ]
+
+
+def test_dedupe_sources_keeps_the_longest_content():
+    """The representative inherits a duplicate's fetched text instead of its own snippet."""
+    snippet_only = source("https://example.com/story?ref=home", 0.9, "Short search snippet.")
+    fetched = source("https://example.com/story", 0.5, ARTICLE)
+    
+    unique = dedupe_sources([snippet_only, fetched])
+    
+    assert len(unique) == 1
+    assert unique[0] is snippet_only
+    assert unique[0].content == ARTICLE
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,76 @@
+"""Checks for content extraction: plugin registration and falling back to html2text."""
+from src.extractors import ContentExtractor, EXTRACTORS, _instances, extract_text, get_extractor, register_extractor
+
+PAGE = """
+<html><head><title>Battery storage</title><script>track()</script></head>
+<body>
+<nav>Home | About | Contact</nav>
+<article><h1>Battery storage</h1>
+<p>Home batteries store solar energy during the day and release it in the evening, when tariffs are highest.</p>
+<p>Lithium iron phosphate cells dominate new installations because they tolerate thousands of cycles.</p>
+</article>
+</body></html>
+"""
+
+
+class BrokenExtractor(ContentExtractor):
+    name = "broken"
+    
+    def extract(self, html: str, max_chars: int) -> str:
+        raise RuntimeError("parser crashed")
+
+
+class EmptyExtractor(ContentExtractor):
+    name = "empty"
+    
+    def extract(self, html: str, max_chars: int) -> str:
+        return ""
+
+
+def test_failing_extractors_fall_back_to_html2text():
+    """An extractor that raises or finds nothing yields the html2text output instead."""
+    try:
+        register_extractor(BrokenExtractor)
+        register_extractor(EmptyExtractor)
+        expected = extract_text(PAGE, 2000, backend="html2text")
+        assert "tolerate thousands of cycles" in expected
+        assert "track()" not in expected
+        assert extract_text(PAGE, 2000, backend="broken") == expected
+        assert extract_text(PAGE, 2000, backend="empty") == expected
+    finally:
+        for name in ("broken", "empty"):
+            EXTRACTORS.pop(name, None)
+            _instances.pop(name, None)
+
+
+def test_register_rejects_incomplete_extractors():
+    """Abstract classes are refused at registration, and unknown names at lookup."""
+    class Incomplete(ContentExtractor):
+        name = "incomplete"
+    
+    try:
+        register_extractor(Incomplete)
+    except TypeError as e:
+        assert "extract" in str(e)
+    else:
+        raise AssertionError("an extractor without extract() must be rejected")
+    assert "incomplete" not in EXTRACTORS
+    
+    try:
+        get_extractor("incomplete")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown extractor names must raise ValueError")
+
+
+def test_truncation_marks_cut_text():
+    text = extract_text(PAGE, 40)
+    assert len(text) == 43 and text.endswith("...")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
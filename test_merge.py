@@ -0,0 +1,74 @@
+"""Checks for the fan-in step: duplicate pages across branches and topping up the fetch budget."""
+import asyncio
+import tempfile
+from pathlib import Path
+import httpx
+import src.agent_nodes as nodes
+from src.cache import SQLiteCache
+from src.mcp_tools import web_fetch
+from src.state import ResearchState, Source
+from src.config import MAX_SOURCES_TO_FETCH
+
+
+def source(url: str, score: float, subtopic: str) -> Source:
+    return Source(url=url, title=url, snippet=f"About {subtopic}.", content="", relevance_score=score, subtopic=subtopic)
+
+
+def test_merge_keeps_one_copy_and_tops_up_fetches():
+    """A page both branches found is kept once with its content, and the budget is filled from the rest."""
+    requested = []
+    
+    def page(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        return httpx.Response(200, headers={"content-type": "text/plain"}, text=f"Article text served for {request.url}.")
+    
+    state = ResearchState(
+        query="home batteries",
+        subtopics=["chemistry", "cost"],
+        branch_sources=[
+            source("https://example.com/story", 0.9, "chemistry"),
+            source("https://chem.example/cells", 0.7, "chemistry"),
+            source("https://www.example.com/story/?utm_source=feed", 0.5, "cost"),
+            source("https://cost.example/rebates", 0.6, "cost"),
+            source("https://cost.example/tariffs", 0.4, "cost"),
+        ],
+        branch_fetched=[{
+            "url": "https://www.example.com/story/?utm_source=feed",
+            "title": "copy",
+            "content": "Fetched by the cost branch.",
+            "fetch_plan": "fetch"
+        }]
+    )
+    
+    async def merge():
+        try:
+            return await nodes.merge_node(state)
+        finally:
+            await web_fetch.aclose()
+    
+    cache, corpus = web_fetch.cache, nodes.corpus
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            web_fetch.cache = SQLiteCache(Path(directory) / "pages.sqlite3", ttl=60, max_entries=10)
+            web_fetch.transport = httpx.MockTransport(page)
+            nodes.corpus = None
+            result = asyncio.run(merge())
+            web_fetch.cache.close()
+        finally:
+            web_fetch.cache, web_fetch.transport, nodes.corpus = cache, None, corpus
+    
+    urls = [source.url for source in result["sources"]]
+    assert len(urls) == 4 and urls[0] == "https://example.com/story"
+    assert result["sources"][0].content == "Fetched by the cost branch."
+    # Only the missing part of the budget was fetched, and never the page already read
+    assert len(requested) == MAX_SOURCES_TO_FETCH - 1
+    assert not any("example.com/story" in url for url in requested)
+    fetched = [item["url"] for item in result["fetched_content"]]
+    assert fetched == urls[:MAX_SOURCES_TO_FETCH]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,53 @@
+"""Checks for choosing which sources to fetch: relevance order versus MMR diversity."""
+from src.selection import select_by_relevance, select_mmr, select_sources
+from src.state import Source
+
+QUERY = "home batteries"
+SUBTOPICS = ["lithium iron phosphate chemistry", "installation cost and incentives"]
+
+
+def source(url: str, score: float, content: str) -> Source:
+    return Source(url=url, title=url, snippet=content[:200], content=content, relevance_score=score)
+
+
+CHEMISTRY = (
+    "Lithium iron phosphate chemistry trades energy density for cycle life: home batteries built on "
+    "lithium iron phosphate cells keep most of their capacity after thousands of cycles and resist thermal runaway."
+)
+CHEMISTRY_COPIES = [
+    source(f"https://site{n}.example/lfp", score, CHEMISTRY + f" Review {n}.")
+    for n, score in enumerate((0.95, 0.93, 0.91))
+]
+COST = source(
+    "https://energy.example/costs",
+    0.6,
+    "Installation cost for home batteries depends on incentives: federal tax credits and utility "
+    "rebates can cover a third of the installation cost, and time-of-use tariffs shorten the payback."
+)
+CANDIDATES = [*CHEMISTRY_COPIES, COST]
+
+
+def test_relevance_picks_the_top_scores():
+    """Plain relevance order takes two copies of the same article."""
+    assert select_by_relevance(CANDIDATES, 2, QUERY, SUBTOPICS) == CHEMISTRY_COPIES[:2]
+
+
+def test_mmr_spreads_picks_across_subtopics():
+    """A near-copy of a picked source loses to a less relevant one on another subtopic."""
+    picks = select_mmr(CANDIDATES, 2, QUERY, SUBTOPICS)
+    assert picks == [CHEMISTRY_COPIES[0], COST]
+
+
+def test_mmr_counts_already_selected_sources():
+    """Sources fetched elsewhere count as picked but are not returned."""
+    picks = select_mmr(CHEMISTRY_COPIES[1:] + [COST], 1, QUERY, SUBTOPICS, selected=CHEMISTRY_COPIES[:1])
+    assert picks == [COST]
+    assert select_mmr(CANDIDATES, 0, QUERY, SUBTOPICS) == []
+    assert len(select_sources(CANDIDATES, 10, QUERY, SUBTOPICS, strategy="mmr")) == len(CANDIDATES)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")